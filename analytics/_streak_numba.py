@@ -0,0 +1,32 @@
+"""
+Numba-compiled activity streak kernel
+Importing this module requires numba; callers fall back to NumPy without it
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def streaks(active: np.ndarray) -> tuple:
+    """Get the current streak, longest streak and active day count in one pass
+    (the last day is today, which doesn't break the streak until it is over)"""
+    current = 0
+    previous = 0
+    longest = 0
+    active_days = 0
+    
+    for day in active:
+        if day:
+            current += 1
+            active_days += 1
+            if current > longest:
+                longest = current
+        else:
+            previous = current
+            current = 0
+    
+    if active.size and not active[-1]:
+        current = previous
+    
+    return current, longest, active_days
@@ -3,25 +3,129 @@ Analytics Data Processing Module
 Handles data aggregation and processing for analytics features
 """
 
+import logging
 import pandas as pd
+import numpy as np
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+from contextlib import contextmanager
+from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 import streamlit as st
+from database.db_manager import DatabaseManager
+
+try:
+    import duckdb
+except ImportError:  # DuckDB is optional; aggregations fall back to SQLite
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+# Value domains of the users table CHECK constraints
+GENDER_DTYPE = pd.CategoricalDtype(['Male', 'Female', 'Other'])
+AGE_GROUP_DTYPE = pd.CategoricalDtype(['18-25', '26-35', '36-45', '46-55', '56+'], ordered=True)
 
 class AnalyticsDataProcessor:
     """Handles data processing for analytics features"""
     
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self._ensure_schema()
+        self._lock = threading.RLock()
+        self._conn = self._open_read_connection()
+        self._duck = self._open_duckdb()
+    
+    def _open_read_connection(self) -> sqlite3.Connection:
+        """Open the long-lived read-only connection shared by all queries"""
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA query_only=1")
+        return conn
+    
+    def _open_duckdb(self):
+        """Attach the database to an in-process DuckDB for the analytic aggregations, if available"""
+        if duckdb is None:
+            return None
+        try:
+            duck = duckdb.connect()
+            db_path = self.db_path.replace("'", "''")  # ATTACH takes a string literal, not a parameter
+            duck.execute(f"ATTACH '{db_path}' AS fit (TYPE SQLITE, READ_ONLY)")
+            duck.execute("USE fit")
+            return duck
+        except duckdb.Error as exc:
+            # e.g. the sqlite extension can't be installed offline
+            logger.warning("DuckDB could not attach %s, aggregating on SQLite instead: %s", self.db_path, exc)
+            return None
     
+    @contextmanager
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Get the shared database connection"""
+        with self._lock:
+            yield self._conn
     
-    @st.cache_data(ttl=60)  # Cache for 1 minute for real-time updates
-    def get_leaderboard_data(_self, limit: int = 50) -> pd.DataFrame:
-        """Get leaderboard data with user rankings"""
+    def _read(self, sql: str, params: tuple = (), dtypes: Optional[Dict] = None,
+              aggregate: bool = False, arrow: bool = False) -> pd.DataFrame:
+        """Run a read query and build a DataFrame with the given column dtypes.
+        Aggregations run on DuckDB's columnar engine when it is available, and
+        display-only frames can be built Arrow-backed (dtypes then name Arrow types)."""
+        if aggregate and self._duck is not None:
+            with self._lock:
+                result = self._duck.execute(sql, list(params))
+                df = result.to_arrow_table().to_pandas(types_mapper=pd.ArrowDtype) if arrow else result.df()
+        elif arrow:
+            with self.get_connection() as conn:
+                df = pd.read_sql(sql, conn, params=params, dtype_backend='pyarrow')
+        else:
+            with self.get_connection() as conn:
+                cursor = conn.execute(sql, params)
+                rows = cursor.fetchall()
+                columns = [column[0] for column in cursor.description]
+            df = pd.DataFrame.from_records(rows, columns=columns)
+        
+        if dtypes:
+            df = df.astype(dtypes, copy=False)
+        return df
+    
+    def _ensure_schema(self):
+        """Have DatabaseManager create or migrate the schema if it predates
+        the epoch-day dates, the daily_progress table or the covering indexes"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(performances)")}
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        finally:
+            conn.close()
+        
+        if (columns.get('date_recorded', '').upper() != 'INTEGER'
+                or not {'daily_progress', 'idx_perf_user_points', 'idx_perf_sport_user'} <= names):
+            DatabaseManager(self.db_path).close()
+    
+    def _query_user_totals(self) -> pd.DataFrame:
+        """Get per-user point totals from a single aggregation over performances"""
+        query = """
+        SELECT 
+            user_id,
+            SUM(points_calculated) as total_points,
+            COUNT(*) as total_activities,
+            MIN(date_recorded) as first_activity_date,
+            MAX(date_recorded) as last_activity_date
+        FROM performances
+        GROUP BY user_id
+        """
+        
+        df = self._read(query, dtypes={
+            'user_id': np.int64, 'total_points': np.float64, 'total_activities': np.int32
+        }, aggregate=True).set_index('user_id')
+        
+        # Convert the epoch-day bounds once so every consumer gets Timestamps
+        for column in ('first_activity_date', 'last_activity_date'):
+            df[column] = pd.to_datetime(df[column], unit='D', origin='unix')
+        return df
+    
+    def _query_user_profiles(self) -> pd.DataFrame:
+        """Get user profile and team details for all users"""
         query = """
         SELECT 
             u.user_id,
@@ -30,62 +134,111 @@ class AnalyticsDataProcessor:
             u.gender,
             u.age_group,
             u.location,
+            u.team_id,
             t.team_name,
-            COALESCE(SUM(p.points_calculated), 0) as total_points,
-            COUNT(p.performance_id) as total_activities,
-            MAX(p.date_recorded) as last_activity_date,
-            AVG(p.points_calculated) as avg_points_per_activity
+            t.description
         FROM users u
-        LEFT JOIN performances p ON u.user_id = p.user_id
         LEFT JOIN teams t ON u.team_id = t.team_id
-        GROUP BY u.user_id, u.username, u.full_name, u.gender, u.age_group, u.location, t.team_name
-        ORDER BY total_points DESC, total_activities DESC
-        LIMIT ?
         """
         
-        with _self.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(limit,))
-            
-            # Add ranking
-            df['rank'] = range(1, len(df) + 1)
-            df = df.set_index('user_id')
-            
-            # Format last activity date
-            df['last_activity_date'] = pd.to_datetime(df['last_activity_date'], errors='coerce')
-            df['days_since_last_activity'] = (datetime.now() - df['last_activity_date']).dt.days
-            
-            return df
+        return self._read(query, dtypes={
+            'user_id': np.int64, 'gender': GENDER_DTYPE, 'age_group': AGE_GROUP_DTYPE, 'team_id': 'Int64',
+            'location': 'category', 'team_name': 'category'
+        }).set_index('user_id')
+    
+    def _get_user_points_totals(self) -> pd.DataFrame:
+        """Join user profiles with their point totals (users without activities get zero totals)"""
+        user_points_totals = _cached_user_profiles(self.db_path).join(_cached_user_totals(self.db_path), how='left')
+        user_points_totals['total_points'] = user_points_totals['total_points'].fillna(0)
+        user_points_totals['total_activities'] = user_points_totals['total_activities'].fillna(0).astype(np.int32)
+        return user_points_totals
+    
+    def get_leaderboard_data(self, limit: int = 50) -> pd.DataFrame:
+        """Get leaderboard data with user rankings"""
+        return cached_leaderboard(self.db_path, limit)
+    
+    def _build_leaderboard(self, limit: int) -> pd.DataFrame:
+        """Rank every user by total points"""
+        df = self._get_user_points_totals()
+        df['avg_points_per_activity'] = df['total_points'] / df['total_activities']
+        df = df.sort_values(['total_points', 'total_activities'], ascending=False, kind='mergesort').head(limit)
+        
+        # Add ranking
+        df = df[[
+            'username', 'full_name', 'gender', 'age_group', 'location', 'team_name',
+            'total_points', 'total_activities', 'last_activity_date', 'avg_points_per_activity'
+        ]].assign(rank=np.arange(1, len(df) + 1, dtype=np.int32))
+        
+        # Low-cardinality columns arrive as categoricals; keep only the values on the board
+        for column in ('gender', 'age_group', 'team_name', 'location'):
+            df[column] = df[column].cat.remove_unused_categories()
+        
+        # Days since last activity
+        last_activity = df['last_activity_date'].to_numpy(dtype='datetime64[D]')
+        days_since = np.datetime64(datetime.now().date(), 'D') - last_activity
+        df['days_since_last_activity'] = pd.arrays.IntegerArray(
+            days_since.astype(np.int64).astype(np.int32), np.isnat(days_since)
+        )
+        
+        return df
+    
+    def get_leaderboard_filter_domains(self) -> Dict[str, List[str]]:
+        """Get the distinct values of the filterable leaderboard columns"""
+        return _cached_filter_domains(self.db_path)
     
-    @st.cache_data(ttl=60)
-    def get_team_leaderboard(_self, limit: int = 20) -> pd.DataFrame:
+    def _query_filter_domains(self) -> Dict[str, List[str]]:
+        """Read the distinct values of the filterable leaderboard columns"""
+        queries = {
+            'gender': "SELECT DISTINCT gender FROM users WHERE gender IS NOT NULL ORDER BY gender",
+            'age_group': "SELECT DISTINCT age_group FROM users WHERE age_group IS NOT NULL ORDER BY age_group",
+            'team_name': """
+            SELECT DISTINCT t.team_name
+            FROM users u
+            JOIN teams t ON u.team_id = t.team_id
+            ORDER BY t.team_name
+            """
+        }
+        
+        with self.get_connection() as conn:
+            return {
+                column: [row[0] for row in conn.execute(query)]
+                for column, query in queries.items()
+            }
+    
+    def get_team_leaderboard(self, limit: int = 20) -> pd.DataFrame:
         """Get team leaderboard data"""
-        query = """
-        SELECT 
-            t.team_name,
-            t.description,
-            COUNT(DISTINCT u.user_id) as member_count,
-            COALESCE(SUM(p.points_calculated), 0) as total_team_points,
-            COALESCE(AVG(p.points_calculated), 0) as avg_points_per_member,
-            COUNT(p.performance_id) as total_team_activities,
-            MAX(p.date_recorded) as last_team_activity
-        FROM teams t
-        LEFT JOIN users u ON t.team_id = u.team_id
-        LEFT JOIN performances p ON u.user_id = p.user_id
-        GROUP BY t.team_id, t.team_name, t.description
-        HAVING member_count > 0
-        ORDER BY total_team_points DESC, avg_points_per_member DESC
-        LIMIT ?
-        """
+        return cached_team_leaderboard(self.db_path, limit)
+    
+    def _build_team_leaderboard(self, limit: int) -> pd.DataFrame:
+        """Rank teams by their members' total points"""
+        members = self._get_user_points_totals()
+        members = members[members['team_name'].notna()]
         
-        with _self.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(limit,))
-            df['team_rank'] = range(1, len(df) + 1)
-            df['last_team_activity'] = pd.to_datetime(df['last_team_activity'], errors='coerce')
-            return df
+        df = members.groupby('team_id', sort=False).agg(
+            team_name=('team_name', 'first'),
+            description=('description', 'first'),
+            member_count=('username', 'size'),
+            total_team_points=('total_points', 'sum'),
+            total_team_activities=('total_activities', 'sum'),
+            last_team_activity=('last_activity_date', 'max')
+        )
+        df['avg_points_per_member'] = (df['total_team_points'] / df['total_team_activities']).fillna(0)
+        df = df.sort_values(
+            ['total_team_points', 'avg_points_per_member'], ascending=False, kind='mergesort'
+        ).head(limit).reset_index(drop=True)
+        df = df[[
+            'team_name', 'description', 'member_count', 'total_team_points',
+            'avg_points_per_member', 'total_team_activities', 'last_team_activity'
+        ]].assign(team_rank=np.arange(1, len(df) + 1, dtype=np.int32))
+        df['team_name'] = df['team_name'].astype('category').cat.remove_unused_categories()
+        return df
     
-    @st.cache_data(ttl=60)
-    def get_sport_leaderboard(_self, sport_name: str, limit: int = 20) -> pd.DataFrame:
+    def get_sport_leaderboard(self, sport_name: str, limit: int = 20) -> pd.DataFrame:
         """Get sport-specific leaderboard"""
+        return cached_sport_leaderboard(self.db_path, sport_name, limit)
+    
+    def _query_sport_leaderboard(self, sport_name: str, limit: int) -> pd.DataFrame:
+        """Rank a sport's athletes by the points they earned in it"""
         query = """
         SELECT 
             u.username,
@@ -102,57 +255,45 @@ class AnalyticsDataProcessor:
         JOIN performances p ON u.user_id = p.user_id
         JOIN sports s ON p.sport_id = s.sport_id
         WHERE s.sport_name = ?
-        GROUP BY u.user_id, u.username, u.full_name, s.sport_name, s.unit
+        GROUP BY p.user_id, u.username, u.full_name, s.sport_name, s.unit
         ORDER BY total_points DESC, total_performance DESC
         LIMIT ?
         """
         
-        with _self.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(sport_name, limit))
-            df['sport_rank'] = range(1, len(df) + 1)
-            df['last_activity'] = pd.to_datetime(df['last_activity'], errors='coerce')
-            return df
+        df = self._read(query, (sport_name, limit), dtypes={
+            'username': 'string[pyarrow]', 'full_name': 'string[pyarrow]',
+            'sport_name': 'string[pyarrow]', 'unit': 'string[pyarrow]',
+            'total_performance': 'double[pyarrow]', 'total_points': 'double[pyarrow]',
+            'activity_count': 'int32[pyarrow]', 'avg_performance': 'double[pyarrow]',
+            'best_performance': 'double[pyarrow]', 'last_activity': 'int32[pyarrow]'
+        }, aggregate=True, arrow=True)
+        df['sport_rank'] = pd.array(np.arange(1, len(df) + 1, dtype=np.int32), dtype='int32[pyarrow]')
+        # Epoch days are exactly Arrow's date32 representation
+        df['last_activity'] = df['last_activity'].astype('date32[pyarrow]')
+        return df
     
-    @st.cache_data(ttl=300)  # Cache for 5 minutes
-    def get_user_progress_data(_self, user_id: int) -> Dict:
-        """Get comprehensive progress data for a specific user"""
+    def get_user_progress_data(self, user_id: int) -> Dict:
+        """Get comprehensive progress data for a specific user (callers cache it)"""
         
-        # Basic user stats
-        user_query = """
-        SELECT 
-            u.username,
-            u.full_name,
-            u.gender,
-            u.age_group,
-            u.location,
-            t.team_name,
-            MIN(p.date_recorded) as first_activity_date,
-            MAX(p.date_recorded) as last_activity_date,
-            COUNT(p.performance_id) as total_activities,
-            SUM(p.points_calculated) as total_points,
-            AVG(p.points_calculated) as avg_points_per_activity
-        FROM users u
-        LEFT JOIN performances p ON u.user_id = p.user_id
-        LEFT JOIN teams t ON u.team_id = t.team_id
-        WHERE u.user_id = ?
-        GROUP BY u.user_id
+        # Every query reads the same user's rows, so filter them once in a CTE
+        user_perf_cte = """
+        WITH user_perf AS (
+            SELECT performance_id, sport_id, value, points_calculated, date_recorded, notes
+            FROM performances
+            WHERE user_id = ?
+        )
         """
         
-        # Daily progress data
+        # Daily progress data, kept pre-aggregated by the database triggers
         daily_query = """
-        SELECT 
-            DATE(p.date_recorded) as activity_date,
-            COUNT(p.performance_id) as daily_activities,
-            SUM(p.points_calculated) as daily_points,
-            SUM(SUM(p.points_calculated)) OVER (ORDER BY DATE(p.date_recorded)) as cumulative_points
-        FROM performances p
-        WHERE p.user_id = ?
-        GROUP BY DATE(p.date_recorded)
+        SELECT activity_date, daily_activities, daily_points
+        FROM daily_progress
+        WHERE user_id = ?
         ORDER BY activity_date
         """
         
         # Sport breakdown
-        sport_query = """
+        sport_query = user_perf_cte + """
         SELECT 
             s.sport_name,
             s.unit,
@@ -161,15 +302,14 @@ class AnalyticsDataProcessor:
             SUM(p.points_calculated) as total_points,
             AVG(p.value) as avg_performance,
             MAX(p.value) as best_performance
-        FROM performances p
+        FROM user_perf p
         JOIN sports s ON p.sport_id = s.sport_id
-        WHERE p.user_id = ?
         GROUP BY s.sport_id, s.sport_name, s.unit
         ORDER BY total_points DESC
         """
         
         # Recent activities
-        recent_query = """
+        recent_query = user_perf_cte + """
         SELECT 
             p.date_recorded as date,
             s.sport_name,
@@ -177,25 +317,70 @@ class AnalyticsDataProcessor:
             p.value,
             p.points_calculated as points,
             p.notes
-        FROM performances p
+        FROM user_perf p
         JOIN sports s ON p.sport_id = s.sport_id
-        WHERE p.user_id = ?
         ORDER BY p.date_recorded DESC
         LIMIT 10
         """
         
-        with _self.get_connection() as conn:
-            user_stats = pd.read_sql_query(user_query, conn, params=(user_id,))
-            daily_progress = pd.read_sql_query(daily_query, conn, params=(user_id,))
-            sport_breakdown = pd.read_sql_query(sport_query, conn, params=(user_id,))
-            recent_activities = pd.read_sql_query(recent_query, conn, params=(user_id,))
+        # Basic user stats, read fresh rather than from the cached all-user totals
+        stats_query = """
+        SELECT 
+            u.username,
+            u.full_name,
+            u.gender,
+            u.age_group,
+            u.location,
+            t.team_name,
+            MIN(p.date_recorded) as first_activity_date,
+            MAX(p.date_recorded) as last_activity_date,
+            COUNT(p.performance_id) as total_activities,
+            COALESCE(SUM(p.points_calculated), 0) as total_points
+        FROM users u
+        LEFT JOIN teams t ON u.team_id = t.team_id
+        LEFT JOIN performances p ON u.user_id = p.user_id
+        WHERE u.user_id = ?
+        GROUP BY u.user_id
+        """
+        
+        with self.get_connection() as conn:
+            # Read all four result sets from one snapshot
+            conn.execute("BEGIN")
+            try:
+                user_stats = self._read(stats_query, (user_id,), dtypes={
+                    'gender': GENDER_DTYPE, 'age_group': AGE_GROUP_DTYPE, 'location': 'category',
+                    'team_name': 'category', 'total_activities': np.int32, 'total_points': np.float64
+                })
+                daily_progress = self._read(daily_query, (user_id,), dtypes={
+                    'daily_activities': np.int32, 'daily_points': np.float64
+                })
+                sport_breakdown = self._read(sport_query, (user_id,), dtypes={
+                    'activity_count': np.int32, 'total_performance': np.float64, 'total_points': np.float64,
+                    'avg_performance': np.float64, 'best_performance': np.float64,
+                    'sport_name': 'category'
+                })
+                recent_activities = self._read(recent_query, (user_id,), dtypes={
+                    'value': np.float64, 'points': np.float64
+                })
+            finally:
+                conn.commit()
+            
+            # Selectbox options, built once with the frame
+            sport_breakdown.attrs['sport_names'] = tuple(sport_breakdown['sport_name'].astype(str))
+            
+            # Running total over the already-ordered daily rows
+            daily_progress['cumulative_points'] = daily_progress['daily_points'].cumsum()
             
-            # Convert dates
-            if not daily_progress.empty:
-                daily_progress['activity_date'] = pd.to_datetime(daily_progress['activity_date'])
+            # A user without activities averages 0 points rather than 0/0
+            user_stats['avg_points_per_activity'] = (
+                user_stats['total_points'] / user_stats['total_activities']
+            ).fillna(0.0)
             
-            if not recent_activities.empty:
-                recent_activities['date'] = pd.to_datetime(recent_activities['date'])
+            # Convert epoch days to dates
+            for column in ('first_activity_date', 'last_activity_date'):
+                user_stats[column] = pd.to_datetime(user_stats[column], unit='D', origin='unix')
+            daily_progress['activity_date'] = pd.to_datetime(daily_progress['activity_date'], unit='D', origin='unix')
+            recent_activities['date'] = pd.to_datetime(recent_activities['date'], unit='D', origin='unix')
             
             return {
                 'user_stats': user_stats,
@@ -204,83 +389,118 @@ class AnalyticsDataProcessor:
                 'recent_activities': recent_activities
             }
     
-    @st.cache_data(ttl=60)
-    def get_user_ranking(_self, user_id: int) -> Dict:
-        """Get user's current ranking and percentile"""
-        
-        # Get user's total points
-        user_points_query = """
-        SELECT COALESCE(SUM(points_calculated), 0) as user_points
-        FROM performances
-        WHERE user_id = ?
-        """
-        
-        # Get all users' points for ranking
-        all_points_query = """
+    def _query_rankings_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get every user's rank and total points as arrays sorted by user_id
+        (tied users share the best rank)"""
+        query = """
         SELECT 
             u.user_id,
-            COALESCE(SUM(p.points_calculated), 0) as total_points
+            COALESCE(SUM(p.points_calculated), 0) as total_points,
+            RANK() OVER (ORDER BY COALESCE(SUM(p.points_calculated), 0) DESC) as rank
         FROM users u
         LEFT JOIN performances p ON u.user_id = p.user_id
         GROUP BY u.user_id
-        ORDER BY total_points DESC
+        ORDER BY u.user_id
         """
         
-        with _self.get_connection() as conn:
-            user_points_df = pd.read_sql_query(user_points_query, conn, params=(user_id,))
-            all_points_df = pd.read_sql_query(all_points_query, conn)
-            
-            if user_points_df.empty:
-                return {'rank': 0, 'total_users': 0, 'percentile': 0, 'user_points': 0}
-            
-            user_points = user_points_df.iloc[0]['user_points']
-            
-            # Find user's rank
-            all_points_df['rank'] = range(1, len(all_points_df) + 1)
-            user_rank_row = all_points_df[all_points_df['user_id'] == user_id]
-            
-            if user_rank_row.empty:
-                return {'rank': 0, 'total_users': len(all_points_df), 'percentile': 0, 'user_points': user_points}
-            
-            user_rank = user_rank_row.iloc[0]['rank']
-            total_users = len(all_points_df)
-            percentile = ((total_users - user_rank + 1) / total_users) * 100
-            
-            return {
-                'rank': user_rank,
-                'total_users': total_users,
-                'percentile': round(percentile, 1),
-                'user_points': user_points
-            }
+        df = self._read(query, dtypes={
+            'user_id': np.int64, 'total_points': np.float64, 'rank': np.int32
+        })
+        return df['user_id'].to_numpy(), df['rank'].to_numpy(), df['total_points'].to_numpy()
     
-    @st.cache_data(ttl=300)
-    def get_available_sports(_self) -> List[str]:
-        """Get list of all available sports"""
-        query = "SELECT sport_name FROM sports ORDER BY sport_name"
-        
-        with _self.get_connection() as conn:
-            df = pd.read_sql_query(query, conn)
-            return df['sport_name'].tolist()
+    def get_user_ranking(self, user_id: int) -> Dict:
+        """Get user's current ranking and percentile"""
+        return cached_user_ranking(self.db_path, user_id)
     
-    @st.cache_data(ttl=300)
-    def get_weekly_progress(_self, user_id: int, weeks: int = 12) -> pd.DataFrame:
-        """Get weekly progress data for the user"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(weeks=weeks)
+    def _rank_user(self, user_id: int) -> Dict:
+        """Look up a user's rank and percentile in the ranking arrays"""
+        user_ids, ranks, points = _cached_rankings_arrays(self.db_path)
+        total_users = len(user_ids)
         
-        query = """
-        SELECT 
-            strftime('%Y-%W', p.date_recorded) as week,
-            COUNT(p.performance_id) as weekly_activities,
-            SUM(p.points_calculated) as weekly_points,
-            AVG(p.points_calculated) as avg_points_per_activity
-        FROM performances p
-        WHERE p.user_id = ? AND p.date_recorded >= ?
-        GROUP BY strftime('%Y-%W', p.date_recorded)
-        ORDER BY week
-        """
+        idx = np.searchsorted(user_ids, user_id)
+        if idx == total_users or user_ids[idx] != user_id:
+            return {'rank': 0, 'total_users': total_users, 'percentile': 0, 'user_points': 0}
+        
+        user_rank = int(ranks[idx])
+        percentile = ((total_users - user_rank + 1) / total_users) * 100
         
-        with _self.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(user_id, start_date.strftime('%Y-%m-%d')))
-            return df
+        return {
+            'rank': user_rank,
+            'total_users': total_users,
+            'percentile': round(percentile, 1),
+            'user_points': float(points[idx])
+        }
+    
+    def get_available_sports(self) -> Tuple[str, ...]:
+        """Get all available sports (static reference data, cached for the process lifetime)"""
+        return _cached_available_sports(self.db_path)
+    
+    def _query_available_sports(self) -> Tuple[str, ...]:
+        """Read the sport names"""
+        query = "SELECT sport_name FROM sports ORDER BY sport_name"
+        
+        with self.get_connection() as conn:
+            return tuple(row[0] for row in conn.execute(query))
+
+
+@st.cache_resource
+def get_processor(db_path: str) -> AnalyticsDataProcessor:
+    """Get the processor (and its shared connection) for a database, one per process"""
+    return AnalyticsDataProcessor(db_path)
+
+
+# Query caches keyed by database path, so every processor and page over the
+# same database shares one entry and concurrent cold loads compute it once
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_user_totals(db_path: str) -> pd.DataFrame:
+    """Get per-user point totals, cached per database"""
+    return get_processor(db_path)._query_user_totals()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_user_profiles(db_path: str) -> pd.DataFrame:
+    """Get user profiles, cached per database"""
+    return get_processor(db_path)._query_user_profiles()
+
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=16)
+def cached_leaderboard(db_path: str, limit: int) -> pd.DataFrame:
+    """Get the overall leaderboard, cached per database and size"""
+    return get_processor(db_path)._build_leaderboard(limit)
+
+
+@st.cache_data(ttl=600, show_spinner=False)  # Profile domains change rarely
+def _cached_filter_domains(db_path: str) -> Dict[str, List[str]]:
+    """Get the leaderboard filter values, cached per database"""
+    return get_processor(db_path)._query_filter_domains()
+
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=16)
+def cached_team_leaderboard(db_path: str, limit: int) -> pd.DataFrame:
+    """Get the team leaderboard, cached per database and size"""
+    return get_processor(db_path)._build_team_leaderboard(limit)
+
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=64)
+def cached_sport_leaderboard(db_path: str, sport_name: str, limit: int) -> pd.DataFrame:
+    """Get a sport's leaderboard, cached per database, sport and size"""
+    return get_processor(db_path)._query_sport_leaderboard(sport_name, limit)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_rankings_arrays(db_path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Get every user's rank and total points, cached per database"""
+    return get_processor(db_path)._query_rankings_arrays()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def cached_user_ranking(db_path: str, user_id: int) -> Dict:
+    """Get a user's rank and percentile, cached per database and user"""
+    return get_processor(db_path)._rank_user(user_id)
+
 
+@st.cache_resource
+def _cached_available_sports(db_path: str) -> Tuple[str, ...]:
+    """Get the sport names, cached per database for the process lifetime"""
+    return get_processor(db_path)._query_available_sports()
@@ -5,15 +5,145 @@ Implements various leaderboard views and ranking systems
 
 import streamlit as st
 import pandas as pd
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from typing import Dict, List, Optional
-from .data_processing import AnalyticsDataProcessor
+from .data_processing import cached_leaderboard, cached_sport_leaderboard, cached_team_leaderboard, get_processor
 from .visualization import AnalyticsVisualizer
 
+
+@st.cache_data(ttl=60)
+def _demographic_agg(db_path: str, limit: int, key: str) -> pd.DataFrame:
+    """Aggregate leaderboard totals per value of a demographic column"""
+    data = cached_leaderboard(db_path, limit)
+    return data.groupby(key, observed=True).agg(**{
+        'Total Points': ('total_points', 'sum'),
+        'Avg Points': ('total_points', 'mean'),
+        'Participants': ('total_points', 'size'),
+        'Total Activities': ('total_activities', 'sum')
+    }).round(2).reset_index()
+
+
+@st.cache_data(ttl=60)
+def _build_sport_bar(db_path: str, sport: str, limit: int, top_n: int) -> go.Figure:
+    """Build the top performers bar chart for a sport"""
+    sport_data = cached_sport_leaderboard(db_path, sport, limit)
+    top_performers = sport_data.head(top_n)
+    unit = sport_data.iloc[0]['unit']
+    
+    fig = go.Figure(data=[
+        go.Bar(
+            y=top_performers['full_name'].to_numpy()[::-1],
+            x=top_performers['total_points'].to_numpy()[::-1],
+            orientation='h',
+            marker_color='lightblue',
+            text=top_performers['total_performance'].to_numpy()[::-1].round(2),
+            textposition='auto',
+            hovertemplate='<b>%{y}</b><br>' +
+                         f'Points: %{{x}}<br>' +
+                         f'Performance: %{{text}} {unit}<br>' +
+                         '<extra></extra>'
+        )
+    ])
+    
+    fig.update_layout(
+        title=f"Top {top_n} {sport} Performers",
+        xaxis_title="Total Points",
+        yaxis_title="Athletes",
+        height=max(400, top_n * 40),
+        margin=dict(l=150)
+    )
+    return fig
+
+
+@st.cache_data(ttl=60)
+def _build_histogram(db_path: str, limit: int, column: str, title: str) -> go.Figure:
+    """Build the distribution histogram of a leaderboard column"""
+    values = cached_leaderboard(db_path, limit)[column].to_numpy(dtype=np.float64)
+    counts, edges = np.histogram(values, bins=20)
+    
+    fig = go.Figure(data=[
+        go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            hovertemplate='%{x}<br>count: %{y}<extra></extra>'
+        )
+    ])
+    
+    fig.update_layout(title=title, xaxis_title=column, yaxis_title="count", bargap=0, height=300)
+    return fig
+
+
+@st.cache_data(ttl=60)
+def _build_gender_bars(db_path: str, limit: int) -> go.Figure:
+    """Build the total/average points by gender comparison"""
+    gender_data = _demographic_agg(db_path, limit, 'gender')
+    
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=('Total Points by Gender', 'Average Points by Gender'),
+        specs=[[{"type": "bar"}, {"type": "bar"}]]
+    )
+    
+    fig.add_trace(
+        go.Bar(x=gender_data['gender'], y=gender_data['Total Points'], name='Total Points'),
+        row=1, col=1
+    )
+    
+    fig.add_trace(
+        go.Bar(x=gender_data['gender'], y=gender_data['Avg Points'], name='Avg Points'),
+        row=1, col=2
+    )
+    
+    fig.update_layout(height=400, showlegend=False)
+    return fig
+
+
+@st.cache_data(ttl=60)
+def _build_age_group_bar(db_path: str, limit: int) -> go.Figure:
+    """Build the average points by age group chart"""
+    fig = px.bar(_demographic_agg(db_path, limit, 'age_group'), x='age_group', y='Avg Points',
+                 title='Average Points by Age Group',
+                 color='Participants', color_continuous_scale='viridis')
+    fig.update_layout(height=400)
+    return fig
+
+
+@st.cache_data(ttl=60)
+def _build_location_bar(db_path: str, limit: int) -> go.Figure:
+    """Build the top locations by total points chart"""
+    location_data = _demographic_agg(db_path, limit, 'location')
+    top_locations = location_data.sort_values('Total Points', ascending=False).head(10)
+    
+    fig = go.Figure(data=[
+        go.Bar(
+            x=top_locations['location'],
+            y=top_locations['Total Points'],
+            marker_color='lightcoral',
+            text=top_locations['Participants'],
+            textposition='auto',
+            hovertemplate='<b>%{x}</b><br>Total Points: %{y}<br>Participants: %{text}<extra></extra>'
+        )
+    ])
+    
+    fig.update_layout(
+        title="Top Locations by Total Points",
+        xaxis_title="Location",
+        yaxis_title="Total Points",
+        height=400
+    )
+    return fig
+
+
 class LeaderboardManager:
     """Manages all leaderboard functionality"""
     
     def __init__(self, db_path: str):
-        self.data_processor = AnalyticsDataProcessor(db_path)
+        self.db_path = db_path
+        self.data_processor = get_processor(db_path)
         self.visualizer = AnalyticsVisualizer()
     
     def render_overall_leaderboard(self, limit: int = 50):
@@ -21,7 +151,7 @@ class LeaderboardManager:
         st.header("🏆 Overall Leaderboard")
         
         # Get leaderboard data
-        leaderboard_data = self.data_processor.get_leaderboard_data(limit)
+        leaderboard_data = cached_leaderboard(self.db_path, limit)
         
         if leaderboard_data.empty:
             st.info("No performance data available yet. Be the first to record an activity!")
@@ -34,46 +164,47 @@ class LeaderboardManager:
             # Show top performers chart
             top_n = st.slider("Show top N users", 5, min(20, len(leaderboard_data)), 10, key="overall_top_n")
             chart = self.visualizer.create_leaderboard_chart(leaderboard_data, top_n)
-            st.plotly_chart(chart, use_container_width=True, config=self.visualizer.chart_config)
+            st.plotly_chart(chart, use_container_width=True, config=self.visualizer.chart_config, key="overall_chart")
         
         with tab2:
             # Show detailed table
             st.subheader("Detailed Rankings")
             
             # Add filters
+            filter_options = self.data_processor.get_leaderboard_filter_domains()
             col1, col2, col3 = st.columns(3)
             with col1:
                 gender_filter = st.selectbox(
                     "Filter by Gender",
-                    ["All"] + list(leaderboard_data['gender'].dropna().unique()),
+                    ["All"] + filter_options['gender'],
                     key="gender_filter"
                 )
             with col2:
                 age_filter = st.selectbox(
                     "Filter by Age Group",
-                    ["All"] + list(leaderboard_data['age_group'].dropna().unique()),
+                    ["All"] + filter_options['age_group'],
                     key="age_filter"
                 )
             with col3:
                 team_filter = st.selectbox(
                     "Filter by Team",
-                    ["All"] + list(leaderboard_data['team_name'].dropna().unique()),
+                    ["All"] + filter_options['team_name'],
                     key="team_filter"
                 )
             
-            # Apply filters
-            filtered_data = leaderboard_data.copy()
+            # Apply all active filters in a single query
+            parts = []
             if gender_filter != "All":
-                filtered_data = filtered_data[filtered_data['gender'] == gender_filter]
+                parts.append("gender == @gender_filter")
             if age_filter != "All":
-                filtered_data = filtered_data[filtered_data['age_group'] == age_filter]
+                parts.append("age_group == @age_filter")
             if team_filter != "All":
-                filtered_data = filtered_data[filtered_data['team_name'] == team_filter]
+                parts.append("team_name == @team_filter")
             
             # Recalculate rankings for filtered data
-            if not filtered_data.empty:
-                filtered_data = filtered_data.reset_index(drop=True)
-                filtered_data['filtered_rank'] = range(1, len(filtered_data) + 1)
+            filtered_data = leaderboard_data.query(" and ".join(parts)) if parts else leaderboard_data
+            filtered_data = filtered_data.reset_index(drop=True)
+            filtered_data['filtered_rank'] = np.arange(1, len(filtered_data) + 1, dtype=np.int32)
             
             # Display table
             if not filtered_data.empty:
@@ -105,13 +236,13 @@ class LeaderboardManager:
         
         with tab3:
             # Show statistics
-            self._render_leaderboard_statistics(leaderboard_data)
+            self._render_leaderboard_statistics(leaderboard_data, limit)
     
     def render_team_leaderboard(self, limit: int = 20):
         """Render team leaderboard"""
         st.header("👥 Team Leaderboard")
         
-        team_data = self.data_processor.get_team_leaderboard(limit)
+        team_data = cached_team_leaderboard(self.db_path, limit)
         
         if team_data.empty:
             st.info("No team data available yet.")
@@ -123,7 +254,7 @@ class LeaderboardManager:
         with tab1:
             top_n = st.slider("Show top N teams", 5, min(15, len(team_data)), 10, key="team_top_n")
             chart = self.visualizer.create_team_comparison_chart(team_data, top_n)
-            st.plotly_chart(chart, use_container_width=True, config=self.visualizer.chart_config)
+            st.plotly_chart(chart, use_container_width=True, config=self.visualizer.chart_config, key="team_chart")
         
         with tab2:
             st.subheader("Team Rankings")
@@ -164,7 +295,7 @@ class LeaderboardManager:
         selected_sport = st.selectbox("Select Sport", sports, key="sport_leaderboard_select")
         
         if selected_sport:
-            sport_data = self.data_processor.get_sport_leaderboard(selected_sport, 30)
+            sport_data = cached_sport_leaderboard(self.db_path, selected_sport, 30)
             
             if sport_data.empty:
                 st.info(f"No performance data available for {selected_sport}.")
@@ -177,33 +308,9 @@ class LeaderboardManager:
                 top_n = st.slider("Show top N performers", 5, min(15, len(sport_data)), 10, key="sport_top_n")
                 
                 # Create sport-specific chart
-                top_performers = sport_data.head(top_n)
-                
-                import plotly.graph_objects as go
-                fig = go.Figure(data=[
-                    go.Bar(
-                        y=top_performers['full_name'][::-1],
-                        x=top_performers['total_points'][::-1],
-                        orientation='h',
-                        marker_color='lightblue',
-                        text=top_performers['total_performance'][::-1].round(2),
-                        textposition='auto',
-                        hovertemplate='<b>%{y}</b><br>' +
-                                     f'Points: %{{x}}<br>' +
-                                     f'Performance: %{{text}} {sport_data.iloc[0]["unit"]}<br>' +
-                                     '<extra></extra>'
-                    )
-                ])
-                
-                fig.update_layout(
-                    title=f"Top {top_n} {selected_sport} Performers",
-                    xaxis_title="Total Points",
-                    yaxis_title="Athletes",
-                    height=max(400, top_n * 40),
-                    margin=dict(l=150)
-                )
+                fig = _build_sport_bar(self.db_path, selected_sport, 30, top_n)
                 
-                st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config)
+                st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config, key="sport_chart")
             
             with tab2:
                 st.subheader(f"{selected_sport} Rankings")
@@ -236,7 +343,8 @@ class LeaderboardManager:
         """Render demographic-based leaderboards"""
         st.header("👨‍👩‍👧‍👦 Demographic Leaderboards")
         
-        leaderboard_data = self.data_processor.get_leaderboard_data(100)
+        limit = 100
+        leaderboard_data = cached_leaderboard(self.db_path, limit)
         
         if leaderboard_data.empty:
             st.info("No demographic data available.")
@@ -246,118 +354,58 @@ class LeaderboardManager:
         tab1, tab2, tab3 = st.tabs(["👫 Gender", "🎂 Age Group", "📍 Location"])
         
         with tab1:
-            self._render_gender_leaderboard(leaderboard_data)
+            self._render_gender_leaderboard(limit)
         
         with tab2:
-            self._render_age_group_leaderboard(leaderboard_data)
+            self._render_age_group_leaderboard(limit)
         
         with tab3:
-            self._render_location_leaderboard(leaderboard_data)
+            self._render_location_leaderboard(limit)
     
-    def _render_gender_leaderboard(self, data: pd.DataFrame):
+    def _render_gender_leaderboard(self, limit: int):
         """Render gender-based leaderboard"""
         st.subheader("Gender Performance Comparison")
         
-        gender_data = data.groupby('gender').agg({
-            'total_points': ['sum', 'mean', 'count'],
-            'total_activities': 'sum'
-        }).round(2)
-        
-        gender_data.columns = ['Total Points', 'Avg Points', 'Participants', 'Total Activities']
-        gender_data = gender_data.reset_index()
+        gender_data = _demographic_agg(self.db_path, limit, 'gender')
         
         if not gender_data.empty:
             # Create comparison chart
-            import plotly.graph_objects as go
-            from plotly.subplots import make_subplots
-            
-            fig = make_subplots(
-                rows=1, cols=2,
-                subplot_titles=('Total Points by Gender', 'Average Points by Gender'),
-                specs=[[{"type": "bar"}, {"type": "bar"}]]
-            )
-            
-            fig.add_trace(
-                go.Bar(x=gender_data['gender'], y=gender_data['Total Points'], name='Total Points'),
-                row=1, col=1
-            )
-            
-            fig.add_trace(
-                go.Bar(x=gender_data['gender'], y=gender_data['Avg Points'], name='Avg Points'),
-                row=1, col=2
-            )
-            
-            fig.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config)
+            fig = _build_gender_bars(self.db_path, limit)
+            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config, key="gender_chart")
             
             # Show table
             st.dataframe(gender_data, hide_index=True, use_container_width=True)
     
-    def _render_age_group_leaderboard(self, data: pd.DataFrame):
+    def _render_age_group_leaderboard(self, limit: int):
         """Render age group leaderboard"""
         st.subheader("Age Group Performance Comparison")
         
-        age_data = data.groupby('age_group').agg({
-            'total_points': ['sum', 'mean', 'count'],
-            'total_activities': 'sum'
-        }).round(2)
-        
-        age_data.columns = ['Total Points', 'Avg Points', 'Participants', 'Total Activities']
-        age_data = age_data.reset_index()
+        age_data = _demographic_agg(self.db_path, limit, 'age_group')
         
         if not age_data.empty:
             # Create chart
-            import plotly.express as px
-            fig = px.bar(age_data, x='age_group', y='Avg Points', 
-                        title='Average Points by Age Group',
-                        color='Participants', color_continuous_scale='viridis')
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config)
+            fig = _build_age_group_bar(self.db_path, limit)
+            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config, key="age_group_chart")
             
             # Show table
             st.dataframe(age_data, hide_index=True, use_container_width=True)
     
-    def _render_location_leaderboard(self, data: pd.DataFrame):
+    def _render_location_leaderboard(self, limit: int):
         """Render location-based leaderboard"""
         st.subheader("Location Performance Comparison")
         
-        location_data = data.groupby('location').agg({
-            'total_points': ['sum', 'mean', 'count'],
-            'total_activities': 'sum'
-        }).round(2)
-        
-        location_data.columns = ['Total Points', 'Avg Points', 'Participants', 'Total Activities']
-        location_data = location_data.reset_index().sort_values('Total Points', ascending=False)
+        location_data = _demographic_agg(self.db_path, limit, 'location').sort_values('Total Points', ascending=False)
         
         if not location_data.empty:
             # Show top locations
-            top_locations = location_data.head(10)
-            
-            import plotly.graph_objects as go
-            fig = go.Figure(data=[
-                go.Bar(
-                    x=top_locations['location'],
-                    y=top_locations['Total Points'],
-                    marker_color='lightcoral',
-                    text=top_locations['Participants'],
-                    textposition='auto',
-                    hovertemplate='<b>%{x}</b><br>Total Points: %{y}<br>Participants: %{text}<extra></extra>'
-                )
-            ])
-            
-            fig.update_layout(
-                title="Top Locations by Total Points",
-                xaxis_title="Location",
-                yaxis_title="Total Points",
-                height=400
-            )
+            fig = _build_location_bar(self.db_path, limit)
             
-            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config)
+            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config, key="location_chart")
             
             # Show table
             st.dataframe(location_data, hide_index=True, use_container_width=True)
     
-    def _render_leaderboard_statistics(self, data: pd.DataFrame):
+    def _render_leaderboard_statistics(self, data: pd.DataFrame, limit: int):
         """Render overall leaderboard statistics"""
         if data.empty:
             return
@@ -390,16 +438,11 @@ class LeaderboardManager:
         
         with col1:
             # Points distribution
-            import plotly.express as px
-            fig = px.histogram(data, x='total_points', nbins=20, 
-                             title='Points Distribution')
-            fig.update_layout(height=300)
-            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config)
+            fig = _build_histogram(self.db_path, limit, 'total_points', 'Points Distribution')
+            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config, key="points_hist_chart")
         
         with col2:
             # Activities distribution
-            fig = px.histogram(data, x='total_activities', nbins=20, 
-                             title='Activities Distribution')
-            fig.update_layout(height=300)
-            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config)
+            fig = _build_histogram(self.db_path, limit, 'total_activities', 'Activities Distribution')
+            st.plotly_chart(fig, use_container_width=True, config=self.visualizer.chart_config, key="activities_hist_chart")
 
@@ -3,18 +3,128 @@ Personal Progress Tracking Module
 Provides detailed personal analytics and progress tracking
 """
 
+import os
+import tempfile
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from .data_processing import AnalyticsDataProcessor
-from .visualization import AnalyticsVisualizer
+from typing import Dict, List, Tuple
+from .data_processing import cached_leaderboard, cached_user_ranking, get_processor
+from .visualization import AnalyticsVisualizer, MAX_TIMELINE_POINTS, lttb_indices
+
+
+def _db_version(db_path: str) -> str:
+    """Get a token that changes whenever the database or its WAL file is written"""
+    stats = [os.stat(path) for path in (db_path, db_path + '-wal') if os.path.exists(path)]
+    return ';'.join(f"{stat.st_mtime_ns}:{stat.st_size}" for stat in stats)
+
+
+def _load_or_fetch(db_path: str, user_id: int, db_version: str) -> Dict:
+    """Get a user's progress data from the Parquet snapshot taken at db_version,
+    refreshing it when the database has changed since"""
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'cache')
+    paths = {
+        name: os.path.join(cache_dir, f"user_{user_id}_{name}.parquet")
+        for name in ('user_stats', 'daily_progress', 'sport_breakdown', 'recent_activities')
+    }
+    
+    if all(os.path.exists(path) for path in paths.values()):
+        try:
+            snapshot = {name: pd.read_parquet(path) for name, path in paths.items()}
+            if all(frame.attrs.get('db_version') == db_version for frame in snapshot.values()):
+                return snapshot
+        except (OSError, ValueError, ImportError):
+            pass  # unreadable snapshot, rebuild it below
+    
+    # Tagged with the version seen before this read, so a write racing it invalidates the snapshot
+    progress_data = get_processor(db_path).get_user_progress_data(user_id)
+    
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, path in paths.items():
+            # Write a private temp file then rename, so concurrent sessions never see a partial file
+            with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as tmp:
+                progress_data[name].attrs['db_version'] = db_version
+                progress_data[name].to_parquet(tmp, compression='zstd', index=False)
+            os.replace(tmp.name, path)
+    except (OSError, ValueError, ImportError):
+        pass  # the snapshot is only an optimization
+    
+    return progress_data
+
+
+@st.cache_data(ttl=300, max_entries=256)
+def _cached_progress(db_path: str, user_id: int, db_version: str) -> Dict:
+    """Get a user's progress data, cached per database version and user"""
+    return _load_or_fetch(db_path, user_id, db_version)
+
+
+def _streak_lengths(active: np.ndarray) -> Tuple[int, int, int]:
+    """Get the current (trailing) run, longest run and count of active days.
+    The last day is today; a streak isn't broken until a whole day passes without activity."""
+    trailing = active if active[-1] else active[:-1]
+    current_streak = int(trailing[::-1].cumprod().sum())
+    
+    diffs = np.diff(np.concatenate(([0], active, [0])))
+    starts = np.flatnonzero(diffs == 1)
+    ends = np.flatnonzero(diffs == -1)
+    longest_streak = int((ends - starts).max()) if starts.size else 0
+    
+    return current_streak, longest_streak, int(active.sum())
+
+
+@st.cache_data(max_entries=1024)
+def _compute_achievements(total_points: float, total_activities: int, sport_count: int) -> List[Tuple[str, str, str]]:
+    """Get the (emoji, title, description) badges earned for the given totals"""
+    achievements = []
+    
+    # Point-based achievements
+    if total_points >= 1000:
+        achievements.append(("🥇", "Point Master", "Earned 1000+ points"))
+    elif total_points >= 500:
+        achievements.append(("🥈", "Point Collector", "Earned 500+ points"))
+    elif total_points >= 100:
+        achievements.append(("🥉", "Getting Started", "Earned 100+ points"))
+    
+    # Activity-based achievements
+    if total_activities >= 50:
+        achievements.append(("🏃‍♂️", "Activity Champion", "Completed 50+ activities"))
+    elif total_activities >= 20:
+        achievements.append(("🚀", "Active Member", "Completed 20+ activities"))
+    elif total_activities >= 5:
+        achievements.append(("⭐", "First Steps", "Completed 5+ activities"))
+    
+    # Sport diversity achievements
+    if sport_count >= 5:
+        achievements.append(("🌟", "Multi-Sport Athlete", f"Active in {sport_count} sports"))
+    elif sport_count >= 3:
+        achievements.append(("🎯", "Diverse Athlete", f"Active in {sport_count} sports"))
+    
+    return achievements
+
 
 class PersonalProgressTracker:
     """Manages personal progress tracking and analytics"""
     
+    _SPORT_DISPLAY_COLS = (
+        'sport_name', 'activity_count', 'total_points',
+        'total_performance', 'avg_performance', 'best_performance', 'unit'
+    )
+    
+    _SPORT_COLUMN_CONFIG = {
+        'sport_name': st.column_config.TextColumn('Sport', width="medium"),
+        'activity_count': st.column_config.NumberColumn('Activities', width="small"),
+        'total_points': st.column_config.NumberColumn('Total Points', format="%.1f"),
+        'total_performance': st.column_config.NumberColumn('Total', format="%.2f"),
+        'avg_performance': st.column_config.NumberColumn('Average', format="%.2f"),
+        'best_performance': st.column_config.NumberColumn('Best', format="%.2f"),
+        'unit': st.column_config.TextColumn('Unit', width="small")
+    }
+    
     def __init__(self, db_path: str):
-        self.data_processor = AnalyticsDataProcessor(db_path)
+        self.db_path = db_path
+        self.data_processor = get_processor(db_path)
         self.visualizer = AnalyticsVisualizer()
     
     def render_personal_dashboard(self, user_id: int):
@@ -22,8 +132,8 @@ class PersonalProgressTracker:
         st.header("📈 Personal Progress Dashboard")
         
         # Get user progress data
-        progress_data = self.data_processor.get_user_progress_data(user_id)
-        user_ranking = self.data_processor.get_user_ranking(user_id)
+        progress_data = _cached_progress(self.db_path, user_id, _db_version(self.db_path))
+        user_ranking = cached_user_ranking(self.db_path, user_id)
         
         if progress_data['user_stats'].empty:
             st.info("No activity data found. Start recording your fitness activities to see your progress!")
@@ -34,25 +144,25 @@ class PersonalProgressTracker:
         # Display overview metrics
         self._render_overview_metrics(user_stats, user_ranking)
         
-        # Create tabs for different views
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
-            "📊 Progress Charts", "🏃‍♂️ Sport Analysis", "📅 Activity Calendar", 
-            "🎯 Goals & Achievements", "📋 Recent Activities"
-        ])
+        # Choose a view; unlike st.tabs, only the selected view is rendered
+        view = st.radio(
+            "View",
+            ["📊 Progress Charts", "🏃‍♂️ Sport Analysis", "📅 Activity Calendar",
+             "🎯 Goals & Achievements", "📋 Recent Activities"],
+            horizontal=True,
+            label_visibility="collapsed",
+            key="dash_tab"
+        )
         
-        with tab1:
+        if view == "📊 Progress Charts":
             self._render_progress_charts(progress_data)
-        
-        with tab2:
+        elif view == "🏃‍♂️ Sport Analysis":
             self._render_sport_analysis(progress_data)
-        
-        with tab3:
+        elif view == "📅 Activity Calendar":
             self._render_activity_calendar(progress_data)
-        
-        with tab4:
+        elif view == "🎯 Goals & Achievements":
             self._render_goals_achievements(user_stats, progress_data)
-        
-        with tab5:
+        else:
             self._render_recent_activities(progress_data['recent_activities'])
     
     def _render_overview_metrics(self, user_stats: pd.Series, user_ranking: Dict):
@@ -98,22 +208,21 @@ class PersonalProgressTracker:
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            if user_stats['team_name']:
+            if pd.notna(user_stats['team_name']):
                 st.info(f"🏢 Team: **{user_stats['team_name']}**")
             else:
                 st.info("🏢 No team assigned")
         
         with col2:
             if pd.notna(user_stats['first_activity_date']):
-                days_active = (pd.to_datetime(user_stats['last_activity_date']) - 
-                             pd.to_datetime(user_stats['first_activity_date'])).days + 1
+                days_active = (user_stats['last_activity_date'] - user_stats['first_activity_date']).days + 1
                 st.info(f"📅 Active for **{days_active}** days")
             else:
                 st.info("📅 Just started!")
         
         with col3:
             if pd.notna(user_stats['last_activity_date']):
-                last_activity = pd.to_datetime(user_stats['last_activity_date'])
+                last_activity = user_stats['last_activity_date']
                 days_since = (datetime.now() - last_activity).days
                 if days_since == 0:
                     st.success("🔥 Active today!")
@@ -126,7 +235,7 @@ class PersonalProgressTracker:
         if user_ranking['total_users'] > 1:
             st.subheader("🎯 Your Ranking")
             ranking_chart = self.visualizer.create_ranking_gauge(user_ranking)
-            st.plotly_chart(ranking_chart, use_container_width=True, config=self.visualizer.chart_config)
+            st.plotly_chart(ranking_chart, use_container_width=True, config=self.visualizer.chart_config, key="ranking_gauge")
     
     def _render_progress_charts(self, progress_data: Dict):
         """Render progress tracking charts"""
@@ -170,10 +279,16 @@ class PersonalProgressTracker:
             chart = self.visualizer.create_progress_timeline(daily_progress, "Daily Progress Timeline")
         elif chart_type == "Points Only":
             import plotly.graph_objects as go
+            points = daily_progress
+            if len(points) > MAX_TIMELINE_POINTS:
+                points = points.iloc[lttb_indices(
+                    points['activity_date'].to_numpy(), points['daily_points'].to_numpy(),
+                    MAX_TIMELINE_POINTS
+                )]
             chart = go.Figure()
             chart.add_trace(go.Scatter(
-                x=daily_progress['activity_date'],
-                y=daily_progress['daily_points'],
+                x=points['activity_date'],
+                y=points['daily_points'],
                 mode='lines+markers',
                 name='Daily Points',
                 line=dict(color='blue', width=2),
@@ -182,30 +297,52 @@ class PersonalProgressTracker:
             chart.update_layout(title="Daily Points", height=400)
         else:  # Activities Only
             import plotly.graph_objects as go
+            activities = daily_progress
+            if len(activities) > MAX_TIMELINE_POINTS:
+                activities = activities.iloc[lttb_indices(
+                    activities['activity_date'].to_numpy(), activities['daily_activities'].to_numpy(),
+                    MAX_TIMELINE_POINTS
+                )]
             chart = go.Figure()
             chart.add_trace(go.Bar(
-                x=daily_progress['activity_date'],
-                y=daily_progress['daily_activities'],
+                x=activities['activity_date'],
+                y=activities['daily_activities'],
                 name='Daily Activities',
                 marker_color='orange'
             ))
             chart.update_layout(title="Daily Activities", height=400)
         
-        st.plotly_chart(chart, use_container_width=True, config=self.visualizer.chart_config)
+        st.plotly_chart(chart, use_container_width=True, config=self.visualizer.chart_config, key="progress_chart")
         
         # Weekly progress
         st.subheader("📊 Weekly Progress")
-        weekly_data = self.data_processor.get_weekly_progress(
-            progress_data['user_stats'].iloc[0].name if not progress_data['user_stats'].empty else 1,
-            weeks=12
-        )
+        weekly_data = self._weekly_from_daily(progress_data['daily_progress'], weeks=12)
         
         if not weekly_data.empty:
             weekly_chart = self.visualizer.create_weekly_progress_chart(weekly_data)
-            st.plotly_chart(weekly_chart, use_container_width=True, config=self.visualizer.chart_config)
+            st.plotly_chart(weekly_chart, use_container_width=True, config=self.visualizer.chart_config, key="weekly_chart")
         else:
             st.info("No weekly progress data available.")
     
+    @staticmethod
+    def _weekly_from_daily(daily_progress: pd.DataFrame, weeks: int = 12) -> pd.DataFrame:
+        """Roll the daily progress up into Monday-based weeks over the last N weeks"""
+        start_date = pd.Timestamp(datetime.now().date() - timedelta(weeks=weeks))
+        recent_days = daily_progress[daily_progress['activity_date'] >= start_date]
+        
+        weekly_data = recent_days.resample('W-SUN', on='activity_date').agg(
+            weekly_activities=('daily_activities', 'sum'),
+            weekly_points=('daily_points', 'sum')
+        )
+        weekly_data = weekly_data[weekly_data['weekly_activities'] > 0]
+        
+        return pd.DataFrame({
+            'week': weekly_data.index.strftime('%Y-%W'),
+            'weekly_activities': weekly_data['weekly_activities'].to_numpy(),
+            'weekly_points': weekly_data['weekly_points'].to_numpy(),
+            'avg_points_per_activity': (weekly_data['weekly_points'] / weekly_data['weekly_activities']).to_numpy()
+        })
+    
     def _render_sport_analysis(self, progress_data: Dict):
         """Render sport-specific analysis"""
         st.subheader("🏃‍♂️ Sport Performance Analysis")
@@ -221,30 +358,15 @@ class PersonalProgressTracker:
         
         with col1:
             pie_chart = self.visualizer.create_sport_breakdown_pie(sport_breakdown)
-            st.plotly_chart(pie_chart, use_container_width=True, config=self.visualizer.chart_config)
+            st.plotly_chart(pie_chart, use_container_width=True, config=self.visualizer.chart_config, key="sport_pie")
         
         with col2:
             # Sport performance table
             st.subheader("Sport Performance Details")
             
-            display_columns = [
-                'sport_name', 'activity_count', 'total_points', 
-                'total_performance', 'avg_performance', 'best_performance', 'unit'
-            ]
-            
-            column_config = {
-                'sport_name': st.column_config.TextColumn('Sport', width="medium"),
-                'activity_count': st.column_config.NumberColumn('Activities', width="small"),
-                'total_points': st.column_config.NumberColumn('Total Points', format="%.1f"),
-                'total_performance': st.column_config.NumberColumn('Total', format="%.2f"),
-                'avg_performance': st.column_config.NumberColumn('Average', format="%.2f"),
-                'best_performance': st.column_config.NumberColumn('Best', format="%.2f"),
-                'unit': st.column_config.TextColumn('Unit', width="small")
-            }
-            
             st.dataframe(
-                sport_breakdown[display_columns],
-                column_config=column_config,
+                sport_breakdown.loc[:, list(self._SPORT_DISPLAY_COLS)],
+                column_config=self._SPORT_COLUMN_CONFIG,
                 hide_index=True,
                 use_container_width=True
             )
@@ -254,7 +376,7 @@ class PersonalProgressTracker:
         
         selected_sport = st.selectbox(
             "Select sport to analyze",
-            sport_breakdown['sport_name'].tolist(),
+            sport_breakdown.attrs['sport_names'],
             key="sport_trend_select"
         )
         
@@ -269,7 +391,7 @@ class PersonalProgressTracker:
         
         # Show sport statistics
         sport_data = progress_data['sport_breakdown']
-        sport_info = sport_data[sport_data['sport_name'] == sport_name].iloc[0]
+        sport_info = sport_data.set_index('sport_name').loc[sport_name]
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -297,23 +419,23 @@ class PersonalProgressTracker:
         
         # Create activity heatmap
         heatmap_chart = self.visualizer.create_activity_heatmap(daily_progress)
-        st.plotly_chart(heatmap_chart, use_container_width=True, config=self.visualizer.chart_config)
+        st.plotly_chart(heatmap_chart, use_container_width=True, config=self.visualizer.chart_config, key="activity_heatmap")
         
         # Activity streak information
         st.subheader("🔥 Activity Streaks")
         
-        # Calculate current streak
-        daily_progress_sorted = daily_progress.sort_values('activity_date', ascending=False)
-        current_streak = 0
+        # Mark each calendar day from the first activity through today as active or not
+        activity_days = daily_progress['activity_date'].to_numpy(dtype='datetime64[D]')
+        first_day = activity_days.min()
+        last_day = max(np.datetime64(datetime.now().date(), 'D'), activity_days.max())
+        active = np.zeros(int((last_day - first_day).astype(np.int64)) + 1, dtype=np.int8)
+        active[(activity_days - first_day).astype(np.int64)] = 1
         
-        for i, row in daily_progress_sorted.iterrows():
-            if row['daily_activities'] > 0:
-                current_streak += 1
-            else:
-                break
-        
-        # Calculate longest streak (simplified)
-        longest_streak = daily_progress[daily_progress['daily_activities'] > 0].shape[0]  # Simplified calculation
+        try:
+            from ._streak_numba import streaks
+        except ImportError:  # numba is optional
+            streaks = _streak_lengths
+        current_streak, longest_streak, active_days = streaks(active)
         
         col1, col2, col3 = st.columns(3)
         
@@ -324,8 +446,7 @@ class PersonalProgressTracker:
             st.metric("Longest Streak", f"{longest_streak} days")
         
         with col3:
-            active_days = daily_progress[daily_progress['daily_activities'] > 0].shape[0]
-            total_days = daily_progress.shape[0]
+            total_days = len(active)
             consistency = (active_days / total_days * 100) if total_days > 0 else 0
             st.metric("Consistency", f"{consistency:.1f}%")
     
@@ -336,32 +457,11 @@ class PersonalProgressTracker:
         # Achievement badges
         st.subheader("🏅 Achievements Unlocked")
         
-        achievements = []
-        total_points = user_stats['total_points']
-        total_activities = user_stats['total_activities']
-        
-        # Point-based achievements
-        if total_points >= 1000:
-            achievements.append(("🥇", "Point Master", "Earned 1000+ points"))
-        elif total_points >= 500:
-            achievements.append(("🥈", "Point Collector", "Earned 500+ points"))
-        elif total_points >= 100:
-            achievements.append(("🥉", "Getting Started", "Earned 100+ points"))
-        
-        # Activity-based achievements
-        if total_activities >= 50:
-            achievements.append(("🏃‍♂️", "Activity Champion", "Completed 50+ activities"))
-        elif total_activities >= 20:
-            achievements.append(("🚀", "Active Member", "Completed 20+ activities"))
-        elif total_activities >= 5:
-            achievements.append(("⭐", "First Steps", "Completed 5+ activities"))
-        
-        # Sport diversity achievements
-        sport_count = len(progress_data['sport_breakdown'])
-        if sport_count >= 5:
-            achievements.append(("🌟", "Multi-Sport Athlete", f"Active in {sport_count} sports"))
-        elif sport_count >= 3:
-            achievements.append(("🎯", "Diverse Athlete", f"Active in {sport_count} sports"))
+        achievements = _compute_achievements(
+            float(user_stats['total_points']),
+            int(user_stats['total_activities']),
+            len(progress_data['sport_breakdown'])
+        )
         
         if achievements:
             cols = st.columns(min(len(achievements), 4))
@@ -404,68 +504,64 @@ class PersonalProgressTracker:
             return
         
         # Display recent activities
-        for _, activity in recent_activities.iterrows():
-            with st.expander(
-                f"{activity['sport_name']} - {activity['value']} {activity['unit']} "
-                f"({activity['points']:.1f} pts) - {activity['date'].strftime('%Y-%m-%d')}"
-            ):
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.write(f"**Sport:** {activity['sport_name']}")
-                    st.write(f"**Performance:** {activity['value']} {activity['unit']}")
-                    st.write(f"**Points Earned:** {activity['points']:.1f}")
-                
-                with col2:
-                    st.write(f"**Date:** {activity['date'].strftime('%Y-%m-%d %H:%M')}")
-                    if pd.notna(activity['notes']) and activity['notes'].strip():
-                        st.write(f"**Notes:** {activity['notes']}")
-                    else:
-                        st.write("**Notes:** No notes added")
+        display_columns = ['date', 'sport_name', 'value', 'unit', 'points', 'notes']
+        
+        column_config = {
+            'date': st.column_config.DatetimeColumn('Date', format="YYYY-MM-DD HH:mm"),
+            'sport_name': st.column_config.TextColumn('Sport', width="medium"),
+            'value': st.column_config.NumberColumn('Performance'),
+            'unit': st.column_config.TextColumn('Unit', width="small"),
+            'points': st.column_config.NumberColumn('Points Earned', format="%.1f"),
+            'notes': st.column_config.TextColumn('Notes', width="large")
+        }
+        
+        st.dataframe(
+            recent_activities[display_columns],
+            column_config=column_config,
+            hide_index=True,
+            use_container_width=True
+        )
     
     def render_comparison_view(self, user_id: int):
         """Render comparison with other users"""
         st.header("⚖️ Performance Comparison")
         
         # Get user's data
-        user_ranking = self.data_processor.get_user_ranking(user_id)
-        leaderboard_data = self.data_processor.get_leaderboard_data(50)
+        user_ranking = cached_user_ranking(self.db_path, user_id)
+        leaderboard_data = cached_leaderboard(self.db_path, 50)
         
         if leaderboard_data.empty:
             st.info("No comparison data available.")
             return
         
         # Find user in leaderboard
-        user_data = leaderboard_data[leaderboard_data.index == user_id]
-        
-        if user_data.empty:
+        if user_id not in leaderboard_data.index:
             st.info("User data not found in leaderboard.")
             return
         
-        user_row = user_data.iloc[0]
+        user_row = leaderboard_data.loc[user_id]
+        
+        # Index by rank once so neighbours are label slices (ranks are already in order)
+        by_rank = leaderboard_data.set_index('rank', drop=False)
         
         # Show comparison with nearby users
         st.subheader("🎯 Compare with Nearby Ranks")
         
-        user_rank = user_row['rank']
+        user_rank = int(user_row['rank'])
         start_rank = max(1, user_rank - 2)
         end_rank = min(len(leaderboard_data), user_rank + 2)
         
-        nearby_users = leaderboard_data[
-            (leaderboard_data['rank'] >= start_rank) & 
-            (leaderboard_data['rank'] <= end_rank)
-        ]
+        nearby_users = by_rank.loc[start_rank:end_rank]
         
-        # Highlight current user
-        def highlight_user(row):
-            if row.name == user_id:
-                return ['background-color: lightblue'] * len(row)
-            return [''] * len(row)
+        # Highlight current user's row in one vectorized pass over the whole frame
+        def highlight_user(frame):
+            is_user = np.broadcast_to((frame.index == user_rank)[:, None], frame.shape)
+            return np.where(is_user, 'background-color: lightblue', '')
         
         display_columns = ['rank', 'full_name', 'total_points', 'total_activities', 'avg_points_per_activity']
         
         st.dataframe(
-            nearby_users[display_columns].style.apply(highlight_user, axis=1),
+            nearby_users[display_columns].style.apply(highlight_user, axis=None),
             hide_index=True,
             use_container_width=True
         )
@@ -474,12 +570,12 @@ class PersonalProgressTracker:
         st.subheader("📊 Performance Gaps")
         
         if user_rank > 1:
-            user_above = leaderboard_data[leaderboard_data['rank'] == user_rank - 1].iloc[0]
+            user_above = by_rank.loc[user_rank - 1]
             points_gap = user_above['total_points'] - user_row['total_points']
             st.info(f"You need **{points_gap:.1f} more points** to reach rank #{user_rank - 1}")
         
         if user_rank < len(leaderboard_data):
-            user_below = leaderboard_data[leaderboard_data['rank'] == user_rank + 1].iloc[0]
+            user_below = by_rank.loc[user_rank + 1]
             points_lead = user_row['total_points'] - user_below['total_points']
             st.success(f"You are **{points_lead:.1f} points** ahead of rank #{user_rank + 1}")
 
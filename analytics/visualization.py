@@ -3,14 +3,67 @@ Analytics Visualization Module
 Creates interactive charts and visualizations for the fitness challenge app
 """
 
-import plotly.express as px
+import importlib.util
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 import streamlit as st
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+# orjson is optional; without it plotly falls back to the json module
+if importlib.util.find_spec("orjson") is not None:
+    pio.json.config.default_engine = "orjson"
+
+# Plotly's qualitative Set3 palette, bound once instead of going through plotly.express
+SET3 = ['rgb(141,211,199)', 'rgb(255,255,179)', 'rgb(190,186,218)', 'rgb(251,128,114)',
+        'rgb(128,177,211)', 'rgb(253,180,98)', 'rgb(179,222,105)', 'rgb(252,205,229)',
+        'rgb(217,217,217)', 'rgb(188,128,189)', 'rgb(204,235,197)', 'rgb(255,237,111)']
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Most points a timeline trace sends to the browser
+MAX_TIMELINE_POINTS = 1000
+
+# Point count above which line traces render with WebGL instead of SVG
+WEBGL_THRESHOLD = 200
+
+# Point count above which the combined progress timeline downsamples to MAX_TIMELINE_POINTS
+LTTB_THRESHOLD = 2000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Pick the indices of at most n_out points that keep a series' visual shape
+    (Largest-Triangle-Three-Buckets downsampling)"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    x = np.asarray(x).astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    
+    # First and last points are always kept; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        
+        # Keep the point forming the largest triangle with the last kept point and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    
+    return indices
+
+
 class AnalyticsVisualizer:
     """Handles all visualization for analytics features"""
     
@@ -32,22 +85,23 @@ class AnalyticsVisualizer:
             'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d']
         }
     
-    def create_progress_timeline(self, daily_progress: pd.DataFrame, title: str = "Daily Progress") -> go.Figure:
+    def _empty_fig(self, title: str, message: str) -> go.Figure:
+        """Build the placeholder figure shown when a chart has no data"""
+        fig = go.Figure(_validate=False)
+        fig.add_annotation(
+            text=message,
+            xref="paper", yref="paper",
+            x=0.5, y=0.5, showarrow=False,
+            font=dict(size=16, color="gray")
+        )
+        fig.update_layout(title=dict(text=title), height=400, showlegend=False)
+        return fig
+    
+    @st.cache_data(show_spinner=False, max_entries=256)
+    def create_progress_timeline(_self, daily_progress: pd.DataFrame, title: str = "Daily Progress") -> go.Figure:
         """Create a timeline chart showing daily progress"""
         if daily_progress.empty:
-            fig = go.Figure()
-            fig.add_annotation(
-                text="No activity data available",
-                xref="paper", yref="paper",
-                x=0.5, y=0.5, showarrow=False,
-                font=dict(size=16, color="gray")
-            )
-            fig.update_layout(
-                title=title,
-                height=400,
-                showlegend=False
-            )
-            return fig
+            return _self._empty_fig(title, "No activity data available")
         
         # Create subplot with secondary y-axis
         fig = make_subplots(
@@ -55,27 +109,41 @@ class AnalyticsVisualizer:
             subplot_titles=[title]
         )
         
+        dates = daily_progress['activity_date'].to_numpy(dtype='datetime64[ns]')
+        daily_points = daily_progress['daily_points'].to_numpy()
+        cumulative_points = daily_progress['cumulative_points'].to_numpy()
+        
+        # Downsample very long histories per series, keeping each one's visual shape
+        if len(dates) > LTTB_THRESHOLD:
+            daily_idx = lttb_indices(dates, daily_points, MAX_TIMELINE_POINTS)
+            cumulative_idx = lttb_indices(dates, cumulative_points, MAX_TIMELINE_POINTS)
+        else:
+            daily_idx = cumulative_idx = slice(None)
+        
         # Add daily points bar chart
         fig.add_trace(
             go.Bar(
-                x=daily_progress['activity_date'],
-                y=daily_progress['daily_points'],
+                x=dates[daily_idx],
+                y=daily_points[daily_idx],
                 name='Daily Points',
-                marker_color=self.colors['primary'],
-                opacity=0.7
+                marker_color=_self.colors['primary'],
+                opacity=0.7,
+                _validate=False
             ),
             secondary_y=False,
         )
         
-        # Add cumulative points line
+        # Add cumulative points line (WebGL for long histories)
+        scatter = go.Scattergl if len(daily_progress) > WEBGL_THRESHOLD else go.Scatter
         fig.add_trace(
-            go.Scatter(
-                x=daily_progress['activity_date'],
-                y=daily_progress['cumulative_points'],
+            scatter(
+                x=dates[cumulative_idx],
+                y=cumulative_points[cumulative_idx],
                 mode='lines+markers',
                 name='Cumulative Points',
-                line=dict(color=self.colors['success'], width=3),
-                marker=dict(size=6)
+                line=dict(color=_self.colors['success'], width=3),
+                marker=dict(size=6),
+                _validate=False
             ),
             secondary_y=True,
         )
@@ -99,34 +167,28 @@ class AnalyticsVisualizer:
         
         return fig
     
-    def create_sport_breakdown_pie(self, sport_breakdown: pd.DataFrame) -> go.Figure:
+    @st.cache_data(show_spinner=False, max_entries=256)
+    def create_sport_breakdown_pie(_self, sport_breakdown: pd.DataFrame) -> go.Figure:
         """Create pie chart showing sport activity breakdown"""
         if sport_breakdown.empty:
-            fig = go.Figure()
-            fig.add_annotation(
-                text="No sport data available",
-                xref="paper", yref="paper",
-                x=0.5, y=0.5, showarrow=False,
-                font=dict(size=16, color="gray")
-            )
-            fig.update_layout(title="Sport Activity Breakdown", height=400)
-            return fig
+            return _self._empty_fig("Sport Activity Breakdown", "No sport data available")
         
         fig = go.Figure(data=[
             go.Pie(
-                labels=sport_breakdown['sport_name'],
-                values=sport_breakdown['total_points'],
+                labels=sport_breakdown['sport_name'].to_numpy(),
+                values=sport_breakdown['total_points'].to_numpy(),
                 hole=0.4,
                 textinfo='label+percent',
                 textposition='auto',
                 marker=dict(
-                    colors=px.colors.qualitative.Set3[:len(sport_breakdown)]
-                )
+                    colors=SET3[:len(sport_breakdown)]
+                ),
+                _validate=False
             )
-        ])
+        ], _validate=False)
         
         fig.update_layout(
-            title="Points by Sport",
+            title=dict(text="Points by Sport"),
             height=500,
             showlegend=True,
             legend=dict(
@@ -140,18 +202,11 @@ class AnalyticsVisualizer:
         
         return fig
     
-    def create_weekly_progress_chart(self, weekly_data: pd.DataFrame) -> go.Figure:
+    @st.cache_data(show_spinner=False, max_entries=256)
+    def create_weekly_progress_chart(_self, weekly_data: pd.DataFrame) -> go.Figure:
         """Create weekly progress chart"""
         if weekly_data.empty:
-            fig = go.Figure()
-            fig.add_annotation(
-                text="No weekly data available",
-                xref="paper", yref="paper",
-                x=0.5, y=0.5, showarrow=False,
-                font=dict(size=16, color="gray")
-            )
-            fig.update_layout(title="Weekly Progress", height=400)
-            return fig
+            return _self._empty_fig("Weekly Progress", "No weekly data available")
         
         fig = make_subplots(
             rows=2, cols=1,
@@ -163,11 +218,12 @@ class AnalyticsVisualizer:
         # Weekly points
         fig.add_trace(
             go.Bar(
-                x=weekly_data['week'],
-                y=weekly_data['weekly_points'],
+                x=weekly_data['week'].to_numpy(),
+                y=weekly_data['weekly_points'].to_numpy(),
                 name='Weekly Points',
-                marker_color=self.colors['primary'],
-                showlegend=False
+                marker_color=_self.colors['primary'],
+                showlegend=False,
+                _validate=False
             ),
             row=1, col=1
         )
@@ -175,11 +231,12 @@ class AnalyticsVisualizer:
         # Weekly activities
         fig.add_trace(
             go.Bar(
-                x=weekly_data['week'],
-                y=weekly_data['weekly_activities'],
+                x=weekly_data['week'].to_numpy(),
+                y=weekly_data['weekly_activities'].to_numpy(),
                 name='Weekly Activities',
-                marker_color=self.colors['secondary'],
-                showlegend=False
+                marker_color=_self.colors['secondary'],
+                showlegend=False,
+                _validate=False
             ),
             row=2, col=1
         )
@@ -195,55 +252,53 @@ class AnalyticsVisualizer:
         
         return fig
     
-    def create_leaderboard_chart(self, leaderboard_data: pd.DataFrame, top_n: int = 10) -> go.Figure:
+    @st.cache_data(show_spinner=False, max_entries=256)
+    def create_leaderboard_chart(_self, leaderboard_data: pd.DataFrame, top_n: int = 10) -> go.Figure:
         """Create horizontal bar chart for leaderboard"""
         if leaderboard_data.empty:
-            fig = go.Figure()
-            fig.add_annotation(
-                text="No leaderboard data available",
-                xref="paper", yref="paper",
-                x=0.5, y=0.5, showarrow=False,
-                font=dict(size=16, color="gray")
-            )
-            fig.update_layout(title="Leaderboard", height=400)
-            return fig
+            return _self._empty_fig("Leaderboard", "No leaderboard data available")
         
-        # Take top N users
+        # Take top N users, reversed (as zero-copy views) for top-to-bottom display
         top_users = leaderboard_data.head(top_n)
+        names = top_users['full_name'].to_numpy()[::-1]
+        points = top_users['total_points'].to_numpy()[::-1]
+        ranks = top_users['rank'].to_numpy()[::-1]
         
         # Create horizontal bar chart
         fig = go.Figure(data=[
             go.Bar(
-                y=top_users['full_name'][::-1],  # Reverse for top-to-bottom display
-                x=top_users['total_points'][::-1],
+                y=names,
+                x=points,
                 orientation='h',
                 marker=dict(
-                    color=top_users['total_points'][::-1],
+                    color=points,
                     colorscale='Viridis',
                     showscale=True,
-                    colorbar=dict(title="Points")
+                    colorbar=dict(title=dict(text="Points"))
                 ),
-                text=top_users['total_points'][::-1],
+                texttemplate='%{x}',  # Label from x rather than sending the points a third time
                 textposition='auto',
                 hovertemplate='<b>%{y}</b><br>' +
                              'Points: %{x}<br>' +
                              'Rank: %{customdata}<br>' +
                              '<extra></extra>',
-                customdata=top_users['rank'][::-1]
+                customdata=ranks,
+                _validate=False
             )
-        ])
+        ], _validate=False)
         
         fig.update_layout(
-            title=f"Top {top_n} Leaderboard",
-            xaxis_title="Total Points",
-            yaxis_title="Users",
+            title=dict(text=f"Top {top_n} Leaderboard"),
+            xaxis_title_text="Total Points",
+            yaxis_title_text="Users",
             height=max(400, top_n * 40),
             margin=dict(l=150)  # More space for names
         )
         
         return fig
     
-    def create_ranking_gauge(self, user_ranking: Dict) -> go.Figure:
+    @st.cache_data(show_spinner=False, max_entries=256)
+    def create_ranking_gauge(_self, user_ranking: Dict) -> go.Figure:
         """Create gauge chart showing user's ranking percentile"""
         percentile = user_ranking.get('percentile', 0)
         rank = user_ranking.get('rank', 0)
@@ -257,7 +312,7 @@ class AnalyticsVisualizer:
             delta = {'reference': 50, 'suffix': "th percentile"},
             gauge = {
                 'axis': {'range': [None, 100]},
-                'bar': {'color': self.colors['primary']},
+                'bar': {'color': _self.colors['primary']},
                 'steps': [
                     {'range': [0, 25], 'color': "lightgray"},
                     {'range': [25, 50], 'color': "gray"},
@@ -269,8 +324,9 @@ class AnalyticsVisualizer:
                     'thickness': 0.75,
                     'value': 90
                 }
-            }
-        ))
+            },
+            _validate=False
+        ), _validate=False)
         
         fig.update_layout(
             height=400,
@@ -279,106 +335,101 @@ class AnalyticsVisualizer:
         
         return fig
     
-    def create_team_comparison_chart(self, team_data: pd.DataFrame, top_n: int = 10) -> go.Figure:
+    @st.cache_data(show_spinner=False, max_entries=256)
+    def create_team_comparison_chart(_self, team_data: pd.DataFrame, top_n: int = 10) -> go.Figure:
         """Create team comparison chart"""
         if team_data.empty:
-            fig = go.Figure()
-            fig.add_annotation(
-                text="No team data available",
-                xref="paper", yref="paper",
-                x=0.5, y=0.5, showarrow=False,
-                font=dict(size=16, color="gray")
-            )
-            fig.update_layout(title="Team Leaderboard", height=400)
-            return fig
+            return _self._empty_fig("Team Leaderboard", "No team data available")
         
         top_teams = team_data.head(top_n)
         
-        fig = go.Figure()
+        fig = go.Figure(_validate=False)
         
         # Total team points
         fig.add_trace(go.Bar(
             name='Total Team Points',
-            x=top_teams['team_name'],
-            y=top_teams['total_team_points'],
-            marker_color=self.colors['primary'],
+            x=top_teams['team_name'].to_numpy(),
+            y=top_teams['total_team_points'].to_numpy(),
+            marker_color=_self.colors['primary'],
             yaxis='y',
-            offsetgroup=1
+            offsetgroup=1,
+            _validate=False
         ))
         
         # Average points per member (scaled for visibility)
         fig.add_trace(go.Bar(
             name='Avg Points per Member',
-            x=top_teams['team_name'],
-            y=top_teams['avg_points_per_member'],
-            marker_color=self.colors['secondary'],
+            x=top_teams['team_name'].to_numpy(),
+            y=top_teams['avg_points_per_member'].to_numpy(),
+            marker_color=_self.colors['secondary'],
             yaxis='y2',
-            offsetgroup=2
+            offsetgroup=2,
+            _validate=False
         ))
         
         # Create subplot with secondary y-axis
         fig.update_layout(
-            xaxis=dict(title='Teams'),
+            xaxis=dict(title=dict(text='Teams')),
             yaxis=dict(
-                title='Total Team Points',
-                tickfont=dict(color=self.colors['primary'])
+                title=dict(text='Total Team Points'),
+                tickfont=dict(color=_self.colors['primary'])
             ),
             yaxis2=dict(
-                title='Average Points per Member',
-                tickfont=dict(color=self.colors['secondary']),
+                title=dict(text='Average Points per Member'),
+                tickfont=dict(color=_self.colors['secondary']),
                 anchor="x",
                 overlaying="y",
                 side="right"
             ),
-            title=f"Top {top_n} Teams Comparison",
+            title=dict(text=f"Top {top_n} Teams Comparison"),
             height=500,
             hovermode='x unified'
         )
         
         return fig
     
-    def create_activity_heatmap(self, daily_progress: pd.DataFrame) -> go.Figure:
+    @st.cache_data(show_spinner=False, max_entries=256)
+    def create_activity_heatmap(_self, daily_progress: pd.DataFrame) -> go.Figure:
         """Create activity heatmap showing activity patterns"""
         if daily_progress.empty:
-            fig = go.Figure()
-            fig.add_annotation(
-                text="No activity data available",
-                xref="paper", yref="paper",
-                x=0.5, y=0.5, showarrow=False,
-                font=dict(size=16, color="gray")
-            )
-            fig.update_layout(title="Activity Heatmap", height=400)
-            return fig
+            return _self._empty_fig("Activity Heatmap", "No activity data available")
         
-        # Prepare data for heatmap
-        daily_progress['weekday'] = daily_progress['activity_date'].dt.day_name()
-        daily_progress['week'] = daily_progress['activity_date'].dt.isocalendar().week
+        # Prepare data for heatmap in a small frame of its own so the caller's frame isn't mutated
+        # Weeks are ISO weeks coded as year * 100 + week, so weeks of different years stay apart
+        iso = daily_progress['activity_date'].dt.isocalendar()
+        heatmap_source = pd.DataFrame({
+            'weekday': (iso['day'] - 1).to_numpy(dtype=np.int8),
+            'week': (iso['year'] * 100 + iso['week']).to_numpy(dtype=np.int32),
+            'daily_points': daily_progress['daily_points'].to_numpy()
+        })
         
         # Create pivot table
-        heatmap_data = daily_progress.pivot_table(
+        heatmap_data = heatmap_source.pivot_table(
             values='daily_points',
             index='weekday',
             columns='week',
             fill_value=0
         )
         
-        # Reorder weekdays
-        weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        heatmap_data = heatmap_data.reindex(weekday_order)
+        # Put weekdays in Monday-first order (weekday codes 0-6)
+        heatmap_data = heatmap_data.reindex(range(7))
         
+        # float32 halves the typed-array payload; the hover format hides float32 rounding noise
         fig = go.Figure(data=go.Heatmap(
-            z=heatmap_data.values,
-            x=heatmap_data.columns,
-            y=heatmap_data.index,
+            z=heatmap_data.to_numpy(dtype=np.float32),
+            x=[f"{week // 100}-W{week % 100:02d}" for week in heatmap_data.columns],
+            y=WEEKDAY_NAMES,
             colorscale='Viridis',
             hoverongaps=False,
-            hovertemplate='Week: %{x}<br>Day: %{y}<br>Points: %{z}<extra></extra>'
-        ))
+            hovertemplate='Week: %{x}<br>Day: %{y}<br>Points: %{z:.2~f}<extra></extra>',
+            _validate=False
+        ), _validate=False)
         
         fig.update_layout(
-            title="Activity Heatmap by Day of Week",
-            xaxis_title="Week of Year",
-            yaxis_title="Day of Week",
+            title=dict(text="Activity Heatmap by Day of Week"),
+            xaxis_title_text="ISO Week",
+            xaxis_type='category',
+            yaxis_title_text="Day of Week",
             height=400
         )
         
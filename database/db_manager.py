@@ -1,72 +1,185 @@
 import sqlite3
 import bcrypt
-from datetime import datetime
+import pandas as pd
+from contextlib import contextmanager
+from datetime import date, datetime
 import os
+from utils.db_pool import SQLiteConnectionPool
+
+# bcrypt cost factor: ~60ms per hash, still well above brute-force-safe levels
+BCRYPT_ROUNDS = 10
+
+# Checked against when a username is unknown so failed logins take the same time
+_DUMMY_HASH = bcrypt.hashpw(b'x', bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+# Performance dates are stored as INTEGER days since 1970-01-01
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def to_epoch_day(day):
+    """Convert a date (or ISO date string) to its epoch-day integer"""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    return day.toordinal() - EPOCH_ORDINAL
 
 class DatabaseManager:
+    # Hot-path queries kept as fixed strings so each connection's statement cache reuses the prepared statement
+    AUTH_SQL = 'SELECT user_id, password_hash FROM users WHERE username = ?'
+    USER_BY_ID_SQL = '''
+        SELECT u.*, t.team_name 
+        FROM users u 
+        LEFT JOIN teams t ON u.team_id = t.team_id 
+        WHERE u.user_id = ?
+    '''
+    
     def __init__(self, db_path="fitness_challenge.db"):
         self.db_path = db_path
+        self._pool = SQLiteConnectionPool(self._open_connection, min_size=2, max_size=10, idle_timeout=300)
         self.init_database()
     
+    def close(self):
+        """Close the pooled connections"""
+        self._pool.close()
+    
+    def _open_connection(self):
+        """Open a pooled connection"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-20000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    @contextmanager
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Borrow a connection from the pool, rolling back on errors"""
+        with self._pool.acquire() as conn:
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
     
     def init_database(self):
         """Initialize database with all required tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Create Users table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    full_name TEXT NOT NULL,
+                    email TEXT UNIQUE NOT NULL,
+                    gender TEXT CHECK(gender IN ('Male', 'Female', 'Other')),
+                    age_group TEXT CHECK(age_group IN ('18-25', '26-35', '36-45', '46-55', '56+')),
+                    location TEXT,
+                    team_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (team_id) REFERENCES teams (team_id)
+                )
+            ''')
+            
+            # Create Teams table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS teams (
+                    team_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    team_name TEXT UNIQUE NOT NULL,
+                    description TEXT,
+                    created_by INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    member_count INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (created_by) REFERENCES users (user_id)
+                )
+            ''')
+            self._ensure_team_member_count(cursor)
+            
+            # Create Sports table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sports (
+                    sport_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sport_name TEXT UNIQUE NOT NULL,
+                    unit TEXT NOT NULL,
+                    points_per_unit REAL NOT NULL,
+                    description TEXT
+                )
+            ''')
+            
+            # Create Performances table
+            self._create_performances_table(cursor, 'performances')
+            self._migrate_epoch_day_dates(cursor)
+
+            # Indexes for per-user history and team membership
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_perf_user_date
+                ON performances(user_id, date_recorded DESC)
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_team ON users(team_id)')
+            
+            # Covering indexes so the per-user and per-sport aggregations are index-only
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_perf_user_points
+                ON performances(user_id, points_calculated, date_recorded)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_perf_sport_user
+                ON performances(sport_id, user_id, points_calculated, value, date_recorded)
+            ''')
+
+            self._create_daily_progress(cursor)
+
+            conn.commit()
         
-        # Create Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                full_name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                gender TEXT CHECK(gender IN ('Male', 'Female', 'Other')),
-                age_group TEXT CHECK(age_group IN ('18-25', '26-35', '36-45', '46-55', '56+')),
-                location TEXT,
-                team_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (team_id) REFERENCES teams (team_id)
-            )
-        ''')
+        # Initialize default sports data
+        self.init_default_sports()
+        self._load_points_per_unit()
+    
+    def _ensure_team_member_count(self, cursor):
+        """Add and backfill teams.member_count on older databases, and keep it in sync with users.team_id"""
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(teams)')}
+        if 'member_count' not in columns:
+            cursor.execute('ALTER TABLE teams ADD COLUMN member_count INTEGER NOT NULL DEFAULT 0')
+            cursor.execute('''
+                UPDATE teams
+                SET member_count = (SELECT COUNT(*) FROM users WHERE users.team_id = teams.team_id)
+            ''')
+            cursor.connection.commit()
         
-        # Create Teams table
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS teams (
-                team_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                team_name TEXT UNIQUE NOT NULL,
-                description TEXT,
-                created_by INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (created_by) REFERENCES users (user_id)
-            )
+            CREATE TRIGGER IF NOT EXISTS users_team_ai AFTER INSERT ON users
+            WHEN NEW.team_id IS NOT NULL
+            BEGIN
+                UPDATE teams SET member_count = member_count + 1 WHERE team_id = NEW.team_id;
+            END
         ''')
-        
-        # Create Sports table
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sports (
-                sport_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sport_name TEXT UNIQUE NOT NULL,
-                unit TEXT NOT NULL,
-                points_per_unit REAL NOT NULL,
-                description TEXT
-            )
+            CREATE TRIGGER IF NOT EXISTS users_team_au AFTER UPDATE OF team_id ON users
+            WHEN OLD.team_id IS NOT NEW.team_id
+            BEGIN
+                UPDATE teams SET member_count = member_count - 1 WHERE team_id = OLD.team_id;
+                UPDATE teams SET member_count = member_count + 1 WHERE team_id = NEW.team_id;
+            END
         ''')
-        
-        # Create Performances table
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS performances (
+            CREATE TRIGGER IF NOT EXISTS users_team_ad AFTER DELETE ON users
+            WHEN OLD.team_id IS NOT NULL
+            BEGIN
+                UPDATE teams SET member_count = member_count - 1 WHERE team_id = OLD.team_id;
+            END
+        ''')
+    
+    def _create_performances_table(self, cursor, table_name):
+        """Create the performances table (date_recorded is an epoch-day INTEGER)"""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table_name} (
                 performance_id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
                 sport_id INTEGER NOT NULL,
                 value REAL NOT NULL,
                 points_calculated REAL NOT NULL,
-                date_recorded DATE NOT NULL,
+                date_recorded INTEGER NOT NULL,
                 notes TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -74,12 +187,90 @@ class DatabaseManager:
                 FOREIGN KEY (sport_id) REFERENCES sports (sport_id)
             )
         ''')
+    
+    def _migrate_epoch_day_dates(self, cursor):
+        """Rebuild a legacy performances table whose date_recorded holds ISO date text"""
+        columns = {row[1]: row[2] for row in cursor.execute('PRAGMA table_info(performances)')}
+        if columns['date_recorded'].upper() == 'INTEGER':
+            return
+        
+        cursor.execute('BEGIN')
+        self._create_performances_table(cursor, 'performances_new')
+        cursor.execute('''
+            INSERT INTO performances_new
+                (performance_id, user_id, sport_id, value, points_calculated,
+                 date_recorded, notes, created_at, updated_at)
+            SELECT performance_id, user_id, sport_id, value, points_calculated,
+                   CASE typeof(date_recorded)
+                       WHEN 'integer' THEN date_recorded
+                       ELSE CAST(julianday(date_recorded) - 2440587.5 AS INTEGER)
+                   END,
+                   notes, created_at, updated_at
+            FROM performances
+        ''')
+        cursor.execute('DROP TABLE performances')
+        cursor.execute('ALTER TABLE performances_new RENAME TO performances')
+        cursor.execute('COMMIT')
+    
+    def _create_daily_progress(self, cursor):
+        """Create the per-user daily totals table, kept in sync with performances by triggers"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_progress'")
+        exists = cursor.fetchone() is not None
         
-        conn.commit()
-        conn.close()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_progress (
+                user_id INTEGER NOT NULL,
+                activity_date INTEGER NOT NULL,
+                daily_points REAL NOT NULL,
+                daily_activities INTEGER NOT NULL,
+                PRIMARY KEY (user_id, activity_date)
+            ) WITHOUT ROWID
+        ''')
+        if not exists:
+            # Backfill from the performances already recorded
+            cursor.execute('''
+                INSERT INTO daily_progress (user_id, activity_date, daily_points, daily_activities)
+                SELECT user_id, date_recorded, SUM(points_calculated), COUNT(*)
+                FROM performances
+                GROUP BY user_id, date_recorded
+            ''')
         
-        # Initialize default sports data
-        self.init_default_sports()
+        add_new = '''
+            INSERT INTO daily_progress (user_id, activity_date, daily_points, daily_activities)
+            VALUES (NEW.user_id, NEW.date_recorded, NEW.points_calculated, 1)
+            ON CONFLICT (user_id, activity_date) DO UPDATE SET
+                daily_points = daily_points + excluded.daily_points,
+                daily_activities = daily_activities + 1;
+        '''
+        remove_old = '''
+            UPDATE daily_progress
+            SET daily_points = daily_points - OLD.points_calculated,
+                daily_activities = daily_activities - 1
+            WHERE user_id = OLD.user_id AND activity_date = OLD.date_recorded;
+            DELETE FROM daily_progress
+            WHERE user_id = OLD.user_id AND activity_date = OLD.date_recorded AND daily_activities <= 0;
+        '''
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS perf_daily_ai AFTER INSERT ON performances
+            BEGIN {add_new} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS perf_daily_ad AFTER DELETE ON performances
+            BEGIN {remove_old} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS perf_daily_au
+            AFTER UPDATE OF user_id, date_recorded, points_calculated ON performances
+            BEGIN {remove_old} {add_new} END
+        ''')
+    
+    def _load_points_per_unit(self):
+        """Cache each sport's points-per-unit rate; the sports table is static reference data"""
+        with self.get_connection() as conn:
+            self._points_per_unit = {
+                sport_id: points_per_unit
+                for sport_id, points_per_unit in conn.execute('SELECT sport_id, points_per_unit FROM sports')
+            }
     
     def init_default_sports(self):
         """Initialize default sports with point calculations"""
@@ -98,21 +289,19 @@ class DatabaseManager:
             ("Football/Soccer", "hours", 18.0, "Football/Soccer - 18 points per hour")
         ]
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        for sport_name, unit, points_per_unit, description in default_sports:
-            cursor.execute('''
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany('''
                 INSERT OR IGNORE INTO sports (sport_name, unit, points_per_unit, description)
                 VALUES (?, ?, ?, ?)
-            ''', (sport_name, unit, points_per_unit, description))
-        
-        conn.commit()
-        conn.close()
+            ''', default_sports)
+            
+            conn.commit()
     
     def hash_password(self, password):
         """Hash password using bcrypt"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
     
     def verify_password(self, password, hashed):
         """Verify password against hash"""
@@ -120,12 +309,11 @@ class DatabaseManager:
     
     def create_user(self, username, password, full_name, email, gender=None, age_group=None, location=None):
         """Create a new user"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         password_hash = self.hash_password(password)
         
-        try:
+        # An IntegrityError (duplicate username/email) is rolled back and re-raised
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO users (username, password_hash, full_name, email, gender, age_group, location)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -133,144 +321,159 @@ class DatabaseManager:
             
             user_id = cursor.lastrowid
             conn.commit()
-            conn.close()
             return user_id
-        except sqlite3.IntegrityError as e:
-            conn.close()
-            raise e
+    
+    def username_exists(self, username):
+        """Check whether a username is already registered"""
+        with self.get_connection() as conn:
+            return conn.execute('SELECT 1 FROM users WHERE username = ? LIMIT 1', (username,)).fetchone() is not None
+    
+    def email_exists(self, email):
+        """Check whether an email is already registered"""
+        with self.get_connection() as conn:
+            return conn.execute('SELECT 1 FROM users WHERE email = ? LIMIT 1', (email,)).fetchone() is not None
     
     def authenticate_user(self, username, password):
         """Authenticate user login"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT user_id, password_hash FROM users WHERE username = ?', (username,))
-        result = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(self.AUTH_SQL, (username,))
+            result = cursor.fetchone()
         
-        if result and self.verify_password(password, result[1]):
+        if result is None:
+            self.verify_password(password, _DUMMY_HASH)
+            return None
+        if self.verify_password(password, result[1]):
             return result[0]  # Return user_id
         return None
     
     def get_user_by_id(self, user_id):
         """Get user information by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT u.*, t.team_name 
-            FROM users u 
-            LEFT JOIN teams t ON u.team_id = t.team_id 
-            WHERE u.user_id = ?
-        ''', (user_id,))
-        
-        result = cursor.fetchone()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(self.USER_BY_ID_SQL, (user_id,))
+            
+            result = cursor.fetchone()
         return result
     
     def get_all_sports(self):
         """Get all available sports"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM sports ORDER BY sport_name')
-        results = cursor.fetchall()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM sports ORDER BY sport_name')
+            results = cursor.fetchall()
         return results
     
     def calculate_points(self, sport_id, value):
         """Calculate points for a performance"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT points_per_unit FROM sports WHERE sport_id = ?', (sport_id,))
-        result = cursor.fetchone()
-        conn.close()
-        
-        if result:
-            return value * result[0]
-        return 0
+        return value * self._points_per_unit.get(sport_id, 0)
     
     def add_performance(self, user_id, sport_id, value, date_recorded, notes=None):
         """Add a new performance entry"""
         points = self.calculate_points(sport_id, value)
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO performances (user_id, sport_id, value, points_calculated, date_recorded, notes)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, sport_id, value, points, date_recorded, notes))
-        
-        performance_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO performances (user_id, sport_id, value, points_calculated, date_recorded, notes)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, sport_id, value, points, to_epoch_day(date_recorded), notes))
+            
+            performance_id = cursor.lastrowid
+            conn.commit()
         return performance_id
     
-    def get_user_performances(self, user_id):
-        """Get all performances for a user"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT p.*, s.sport_name, s.unit
-            FROM performances p
-            JOIN sports s ON p.sport_id = s.sport_id
-            WHERE p.user_id = ?
-            ORDER BY p.date_recorded DESC
-        ''', (user_id,))
-        
-        results = cursor.fetchall()
-        conn.close()
+    def get_recent_performances(self, user_id, limit=5):
+        """Get a user's most recent performances"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT p.*, s.sport_name, s.unit
+                FROM performances p
+                JOIN sports s ON p.sport_id = s.sport_id
+                WHERE p.user_id = ?
+                ORDER BY p.date_recorded DESC
+                LIMIT ?
+            ''', (user_id, limit))
+            
+            results = cursor.fetchall()
         return results
     
-    def create_team(self, team_name, description, created_by):
-        """Create a new team"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        try:
+    def get_performance_summary(self, user_id):
+        """Get a user's activity count and total points"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT COUNT(*), COALESCE(SUM(points_calculated), 0)
+                FROM performances
+                WHERE user_id = ?
+            ''', (user_id,))
+            
+            result = cursor.fetchone()
+        return result
+    
+    def get_user_performances_df(self, user_id):
+        """Get all performances for a user as a typed DataFrame, newest first"""
+        with self.get_connection() as conn:
+            return pd.read_sql_query('''
+                SELECT p.performance_id, p.date_recorded, s.sport_name, p.value, s.unit,
+                       p.points_calculated, p.notes
+                FROM performances p
+                JOIN sports s ON p.sport_id = s.sport_id
+                WHERE p.user_id = ?
+                ORDER BY p.date_recorded DESC
+            ''', conn, params=(user_id,), parse_dates={'date_recorded': {'unit': 'D'}})
+    
+    def team_name_exists(self, team_name):
+        """Check whether a team name is already taken"""
+        with self.get_connection() as conn:
+            return conn.execute('SELECT 1 FROM teams WHERE team_name = ? LIMIT 1', (team_name,)).fetchone() is not None
+    
+    def create_team_and_join(self, team_name, description, user_id):
+        """Create a new team and make its creator a member in a single transaction"""
+        # An IntegrityError (duplicate team name) is rolled back and re-raised
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO teams (team_name, description, created_by)
                 VALUES (?, ?, ?)
-            ''', (team_name, description, created_by))
+            ''', (team_name, description, user_id))
             
             team_id = cursor.lastrowid
+            cursor.execute('UPDATE users SET team_id = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?', 
+                          (team_id, user_id))
             conn.commit()
-            conn.close()
             return team_id
-        except sqlite3.IntegrityError as e:
-            conn.close()
-            raise e
     
     def get_all_teams(self):
         """Get all teams"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT t.*, u.full_name as creator_name,
-                   COUNT(members.user_id) as member_count
-            FROM teams t
-            JOIN users u ON t.created_by = u.user_id
-            LEFT JOIN users members ON t.team_id = members.team_id
-            GROUP BY t.team_id
-            ORDER BY t.team_name
-        ''')
-        
-        results = cursor.fetchall()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT t.team_id, t.team_name, t.description, t.created_by, t.created_at,
+                       u.full_name as creator_name, t.member_count
+                FROM teams t
+                JOIN users u ON t.created_by = u.user_id
+                ORDER BY t.team_name
+            ''')
+            
+            results = cursor.fetchall()
         return results
     
     def join_team(self, user_id, team_id):
         """Add user to a team"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('UPDATE users SET team_id = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?', 
-                      (team_id, user_id))
-        
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('UPDATE users SET team_id = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?', 
+                          (team_id, user_id))
+            
+            conn.commit()
 
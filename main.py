@@ -1,4 +1,6 @@
 import streamlit as st
+import pandas as pd
+import sqlite3
 import sys
 import os
 
@@ -6,7 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from utils.session_manager import SessionManager
-from database.db_manager import DatabaseManager
+from utils.db_singleton import get_db
 from analytics.leaderboards import LeaderboardManager
 from analytics.personal_progress import PersonalProgressTracker
 
@@ -18,34 +20,115 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Database shared by the app and the analytics pages, next to this file whatever the working directory
+_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fitness_challenge.db')
+
+# Custom CSS for better styling
+STYLE_BLOCK = """
+<style>
+.main-header {
+    font-size: 3rem;
+    color: #1f77b4;
+    text-align: center;
+    margin-bottom: 2rem;
+}
+.sidebar-header {
+    font-size: 1.5rem;
+    color: #ff7f0e;
+    margin-bottom: 1rem;
+}
+.metric-card {
+    background-color: #f0f2f6;
+    padding: 1rem;
+    border-radius: 0.5rem;
+    margin: 0.5rem 0;
+}
+</style>
+"""
+
+# Profile option lists, with label -> index lookups for preselecting stored values
+GENDERS = ("", "Male", "Female", "Other")
+AGE_GROUPS = ("", "18-25", "26-35", "36-45", "46-55", "56+")
+GENDER_IDX = {g: i for i, g in enumerate(GENDERS)}
+AGE_IDX = {a: i for i, a in enumerate(AGE_GROUPS)}
+
+@st.cache_resource
+def get_session_manager():
+    """Get the process-wide SessionManager (per-user state lives in st.session_state)"""
+    return SessionManager(_DB_PATH)
+
 # Initialize session manager
-session_manager = SessionManager()
+session_manager = get_session_manager()
+session_manager.init_session_state()
+
+@st.cache_data(ttl=24*60*60, show_spinner=False)
+def _cached_sports():
+    """Get the sport selectbox options (label -> sport_id) and each sport row by id
+    (static reference data)"""
+    sport_options = {}
+    sport_by_id = {}
+    for sport in get_db(_DB_PATH).get_all_sports():
+        sport_options[f"{sport[1]} ({sport[2]})"] = sport[0]
+        sport_by_id[sport[0]] = sport
+    return sport_options, sport_by_id
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _team_choices():
+    """Get the join-team selectbox labels and label -> team_id map; cleared whenever team membership changes"""
+    teams = get_db(_DB_PATH).get_all_teams()
+    labels = [f"{team[1]} ({team[6]} members)" for team in teams]  # member_count is at index 6
+    return labels, dict(zip(labels, (team[0] for team in teams)))
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _recent_perfs(uid):
+    """Build the table of a user's five most recent performances; cleared whenever a performance is recorded"""
+    recent = pd.DataFrame.from_records(get_db(_DB_PATH).get_recent_performances(uid, 5), columns=[
+        'performance_id', 'user_id', 'sport_id', 'value', 'points_calculated', 'date_recorded',
+        'notes', 'created_at', 'updated_at', 'sport_name', 'unit'
+    ])
+    return pd.DataFrame({
+        "Sport": recent['sport_name'],
+        "Performance": recent['value'].astype(str) + ' ' + recent['unit'],
+        "Points": recent['points_calculated'],
+        "Date": pd.to_datetime(recent['date_recorded'], unit='D').dt.date
+    })
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _perf_summary(uid):
+    """Get a user's (activity count, total points); cleared alongside _recent_perfs"""
+    return get_db(_DB_PATH).get_performance_summary(uid)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _history_frame(uid):
+    """Build a user's performance history table and points total; cleared alongside _recent_perfs"""
+    performances = get_db(_DB_PATH).get_user_performances_df(uid)
+    if performances.empty:
+        return pd.DataFrame(), 0.0
+    
+    df = pd.DataFrame({
+        "Date": performances['date_recorded'].dt.date,
+        "Sport": performances['sport_name'],
+        "Performance": performances['value'].astype(str) + ' ' + performances['unit'],
+        "Points": performances['points_calculated'].round(1).astype(str),
+        "Notes": performances['notes'].fillna("")
+    })
+    return df, performances['points_calculated'].sum()
+
+@st.cache_resource
+def get_leaderboard_mgr():
+    """Get the process-wide LeaderboardManager"""
+    return LeaderboardManager(_DB_PATH)
+
+@st.cache_resource
+def get_progress_tracker():
+    """Get the process-wide PersonalProgressTracker"""
+    return PersonalProgressTracker(_DB_PATH)
 
 def main():
     """Main application function"""
     
-    # Custom CSS for better styling
-    st.markdown("""
-    <style>
-    .main-header {
-        font-size: 3rem;
-        color: #1f77b4;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .sidebar-header {
-        font-size: 1.5rem;
-        color: #ff7f0e;
-        margin-bottom: 1rem;
-    }
-    .metric-card {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin: 0.5rem 0;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # Custom CSS for better styling (re-sent each run: elements a rerun skips are removed)
+    st.markdown(STYLE_BLOCK, unsafe_allow_html=True)
     
     # Main header
     st.markdown('<h1 class="main-header">🏃‍♂️ Fitness Challenge App</h1>', unsafe_allow_html=True)
@@ -59,50 +142,20 @@ def main():
             st.success(f"Welcome, {user_data[3]}!")  # full_name is at index 3
             
             # Navigation menu for logged-in users
-            page = st.selectbox(
-                "Choose a page:",
-                [
-                    "Dashboard",
-                    "Record Performance", 
-                    "Performance History",
-                    "Team Management",
-                    "Leaderboards",
-                    "Personal Progress",
-                    "Profile Settings"
-                ]
-            )
+            page = st.selectbox("Choose a page:", list(PAGES))
             
             if st.button("Logout"):
                 session_manager.logout()
                 st.rerun()
         else:
             # Navigation for non-logged-in users
-            page = st.selectbox(
-                "Choose a page:",
-                ["Login", "Register"]
-            )
+            page = st.selectbox("Choose a page:", list(PUBLIC_PAGES))
     
     # Route to appropriate page
     if not session_manager.is_logged_in():
-        if page == "Register":
-            show_register_page()
-        else:
-            show_login_page()
+        PUBLIC_PAGES[page]()
     else:
-        if page == "Dashboard":
-            show_dashboard()
-        elif page == "Record Performance":
-            show_record_performance()
-        elif page == "Performance History":
-            show_performance_history()
-        elif page == "Team Management":
-            show_team_management()
-        elif page == "Leaderboards":
-            show_leaderboards()
-        elif page == "Personal Progress":
-            show_personal_progress()
-        elif page == "Profile Settings":
-            show_profile_settings()
+        PAGES[page]()
 
 def show_login_page():
     """Display login page"""
@@ -137,14 +190,21 @@ def show_register_page():
             email = st.text_input("Email*")
         
         with col2:
-            gender = st.selectbox("Gender", ["", "Male", "Female", "Other"])
-            age_group = st.selectbox("Age Group", ["", "18-25", "26-35", "36-45", "46-55", "56+"])
+            gender = st.selectbox("Gender", GENDERS)
+            age_group = st.selectbox("Age Group", AGE_GROUPS)
             location = st.text_input("Location")
         
         submit_button = st.form_submit_button("Register")
         
         if submit_button:
-            if username and password and full_name and email:
+            db = get_db(_DB_PATH)
+            if not (username and password and full_name and email):
+                st.error("Please fill in all required fields (*)")
+            elif db.username_exists(username):
+                st.error("Registration failed. Username already exists.")
+            elif db.email_exists(email):
+                st.error("Registration failed. An account with this email already exists.")
+            else:
                 user_id = session_manager.register_user(
                     username, password, full_name, email,
                     gender if gender else None,
@@ -155,23 +215,18 @@ def show_register_page():
                     st.success("Registration successful! Please login.")
                 else:
                     st.error("Registration failed. Username or email might already exist.")
-            else:
-                st.error("Please fill in all required fields (*)")
 
 def show_dashboard():
     """Display main dashboard"""
     st.header("Personal Dashboard")
     
     user_data = session_manager.get_user_data()
-    db = DatabaseManager()
+    user_id = session_manager.get_current_user_id()
     
-    # Get user performances
-    performances = db.get_user_performances(session_manager.get_current_user_id())
+    # Get activity totals and the latest performances
+    activity_count, total_points = _perf_summary(user_id)
     
-    if performances:
-        # Calculate total points
-        total_points = sum([p[4] for p in performances])  # points_calculated is at index 4
-        
+    if activity_count:
         # Display metrics
         col1, col2, col3 = st.columns(3)
         
@@ -179,7 +234,7 @@ def show_dashboard():
             st.metric("Total Points", f"{total_points:.1f}")
         
         with col2:
-            st.metric("Total Activities", len(performances))
+            st.metric("Total Activities", activity_count)
         
         with col3:
             if user_data[7]:  # team_name
@@ -189,19 +244,12 @@ def show_dashboard():
         
         # Recent activities
         st.subheader("Recent Activities")
-        recent_performances = performances[:5]  # Show last 5
-        
-        for perf in recent_performances:
-            with st.container():
-                col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
-                with col1:
-                    st.write(f"**{perf[7]}**")  # sport_name
-                with col2:
-                    st.write(f"{perf[3]} {perf[8]}")  # value and unit
-                with col3:
-                    st.write(f"{perf[4]:.1f} pts")  # points
-                with col4:
-                    st.write(perf[5])  # date_recorded
+        st.dataframe(
+            _recent_perfs(user_id),  # Show last 5
+            use_container_width=True,
+            hide_index=True,
+            column_config={"Points": st.column_config.NumberColumn(format="%.1f pts")}
+        )
     else:
         st.info("No activities recorded yet. Start by recording your first performance!")
         if st.button("Record Performance"):
@@ -212,19 +260,19 @@ def show_record_performance():
     """Display performance recording page"""
     st.header("Record Performance")
     
-    db = DatabaseManager()
-    sports = db.get_all_sports()
+    db = get_db(_DB_PATH)
+    user_id = session_manager.get_current_user_id()
+    sport_options, sport_by_id = _cached_sports()
     
     with st.form("performance_form"):
         col1, col2 = st.columns(2)
         
         with col1:
-            sport_options = {f"{sport[1]} ({sport[2]})": sport[0] for sport in sports}
             selected_sport = st.selectbox("Select Sport", list(sport_options.keys()))
             sport_id = sport_options[selected_sport]
             
             # Get sport details for point calculation
-            selected_sport_data = next(sport for sport in sports if sport[0] == sport_id)
+            selected_sport_data = sport_by_id[sport_id]
             
             value = st.number_input(f"Performance ({selected_sport_data[2]})", min_value=0.0, step=0.1)
             
@@ -242,13 +290,16 @@ def show_record_performance():
         if submit_button:
             if value > 0:
                 performance_id = db.add_performance(
-                    session_manager.get_current_user_id(),
+                    user_id,
                     sport_id,
                     value,
                     date_recorded,
                     notes if notes else None
                 )
                 if performance_id:
+                    _recent_perfs.clear()
+                    _perf_summary.clear()
+                    _history_frame.clear()
                     st.success("Performance recorded successfully!")
                 else:
                     st.error("Failed to record performance")
@@ -259,29 +310,15 @@ def show_performance_history():
     """Display performance history page"""
     st.header("Performance History")
     
-    db = DatabaseManager()
-    performances = db.get_user_performances(session_manager.get_current_user_id())
+    user_id = session_manager.get_current_user_id()
+    df, total_points = _history_frame(user_id)
     
-    if performances:
-        # Create a table of performances
-        import pandas as pd
-        
-        df_data = []
-        for perf in performances:
-            df_data.append({
-                "Date": perf[5],
-                "Sport": perf[7],
-                "Performance": f"{perf[3]} {perf[8]}",
-                "Points": f"{perf[4]:.1f}",
-                "Notes": perf[6] if perf[6] else ""
-            })
-        
-        df = pd.DataFrame(df_data)
+    if not df.empty:
+        # Table of performances
         st.dataframe(df, use_container_width=True)
         
         # Summary statistics
         st.subheader("Summary")
-        total_points = sum([p[4] for p in performances])
         st.metric("Total Points", f"{total_points:.1f}")
         
     else:
@@ -291,14 +328,16 @@ def show_team_management():
     """Display team management page"""
     st.header("Team Management")
     
-    db = DatabaseManager()
+    db = get_db(_DB_PATH)
     user_data = session_manager.get_user_data()
+    user_id = session_manager.get_current_user_id()
     
     # Current team status
     if user_data[6]:  # team_id
         st.success(f"You are currently a member of: **{user_data[7]}**")
         if st.button("Leave Team"):
-            db.join_team(session_manager.get_current_user_id(), None)
+            db.join_team(user_id, None)
+            _team_choices.clear()
             session_manager.refresh_user_data()
             st.rerun()
     else:
@@ -311,37 +350,40 @@ def show_team_management():
         description = st.text_area("Team Description")
         
         if st.form_submit_button("Create Team"):
-            if team_name:
+            if not team_name:
+                st.error("Please enter a team name")
+            elif db.team_name_exists(team_name):
+                st.error("Team name already exists")
+            else:
                 try:
-                    team_id = db.create_team(team_name, description, session_manager.get_current_user_id())
-                    db.join_team(session_manager.get_current_user_id(), team_id)
+                    db.create_team_and_join(team_name, description, user_id)
+                except sqlite3.IntegrityError:
+                    # Another user took the name between the check and the insert
+                    st.error("Team name already exists")
+                else:
+                    _team_choices.clear()
                     session_manager.refresh_user_data()
                     st.success("Team created successfully!")
                     st.rerun()
-                except:
-                    st.error("Team name already exists")
-            else:
-                st.error("Please enter a team name")
     
     # Join existing team
     st.subheader("Join Existing Team")
-    teams = db.get_all_teams()
+    team_labels, team_options = _team_choices()
     
-    if teams:
-        team_options = {f"{team[1]} ({team[5]} members)": team[0] for team in teams}
-        selected_team = st.selectbox("Select Team to Join", [""] + list(team_options.keys()))
+    if team_labels:
+        selected_team = st.selectbox("Select Team to Join", [""] + team_labels)
         
         if selected_team and st.button("Join Team"):
             team_id = team_options[selected_team]
-            db.join_team(session_manager.get_current_user_id(), team_id)
+            db.join_team(user_id, team_id)
+            _team_choices.clear()
             session_manager.refresh_user_data()
             st.success("Joined team successfully!")
             st.rerun()
 
 def show_leaderboards():
     """Display leaderboards page"""
-    db_path = os.path.join(os.path.dirname(__file__), 'fitness_challenge.db')
-    leaderboard_manager = LeaderboardManager(db_path)
+    leaderboard_manager = get_leaderboard_mgr()
     
     # Create tabs for different leaderboard views
     tab1, tab2, tab3, tab4 = st.tabs([
@@ -362,8 +404,7 @@ def show_leaderboards():
 
 def show_personal_progress():
     """Display personal progress page"""
-    db_path = os.path.join(os.path.dirname(__file__), 'fitness_challenge.db')
-    progress_tracker = PersonalProgressTracker(db_path)
+    progress_tracker = get_progress_tracker()
     
     user_id = session_manager.get_current_user_id()
     
@@ -381,7 +422,7 @@ def show_profile_settings():
     st.header("Profile Settings")
     
     user_data = session_manager.get_user_data()
-    db = DatabaseManager()
+    db = get_db(_DB_PATH)
     
     with st.form("profile_form"):
         col1, col2 = st.columns(2)
@@ -389,18 +430,34 @@ def show_profile_settings():
         with col1:
             full_name = st.text_input("Full Name", value=user_data[3])
             email = st.text_input("Email", value=user_data[4])
-            gender = st.selectbox("Gender", ["", "Male", "Female", "Other"], 
-                                index=["", "Male", "Female", "Other"].index(user_data[5] or ""))
+            gender = st.selectbox("Gender", GENDERS,
+                                index=GENDER_IDX.get(user_data[5] or "", 0))
         
         with col2:
-            age_group = st.selectbox("Age Group", ["", "18-25", "26-35", "36-45", "46-55", "56+"],
-                                   index=["", "18-25", "26-35", "36-45", "46-55", "56+"].index(user_data[6] or ""))
+            age_group = st.selectbox("Age Group", AGE_GROUPS,
+                                   index=AGE_IDX.get(user_data[6] or "", 0))
             location = st.text_input("Location", value=user_data[7] or "")
         
         if st.form_submit_button("Update Profile"):
             # Note: This would require additional database methods to update user info
             st.success("Profile update functionality will be implemented in the next phase.")
 
+# Navigation pages, in menu order
+PUBLIC_PAGES = {
+    "Login": show_login_page,
+    "Register": show_register_page
+}
+
+PAGES = {
+    "Dashboard": show_dashboard,
+    "Record Performance": show_record_performance,
+    "Performance History": show_performance_history,
+    "Team Management": show_team_management,
+    "Leaderboards": show_leaderboards,
+    "Personal Progress": show_personal_progress,
+    "Profile Settings": show_profile_settings
+}
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,122 @@
+import sqlite3
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from analytics.data_processing import AnalyticsDataProcessor, cached_sport_leaderboard, get_processor
+from database.db_manager import DatabaseManager
+
+# Schema written by releases that stored performance dates as ISO text
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    full_name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    gender TEXT,
+    age_group TEXT,
+    location TEXT,
+    team_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE teams (
+    team_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    team_name TEXT UNIQUE NOT NULL,
+    description TEXT,
+    created_by INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE sports (
+    sport_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sport_name TEXT UNIQUE NOT NULL,
+    unit TEXT NOT NULL,
+    points_per_unit REAL NOT NULL,
+    description TEXT
+);
+CREATE TABLE performances (
+    performance_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    sport_id INTEGER NOT NULL,
+    value REAL NOT NULL,
+    points_calculated REAL NOT NULL,
+    date_recorded DATE NOT NULL,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO users (username, password_hash, full_name, email) VALUES ('runner', 'x', 'Runner', 'runner@example.com');
+INSERT INTO sports (sport_name, unit, points_per_unit) VALUES ('Running', 'km', 10.0);
+INSERT INTO performances (user_id, sport_id, value, points_calculated, date_recorded)
+VALUES (1, 1, 5.0, 50.0, '2025-08-13'), (1, 1, 2.0, 20.0, '2025-08-14');
+"""
+
+
+def _create_db(tmp_path, schema):
+    db_path = str(tmp_path / "fitness_challenge.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(schema)
+    conn.close()
+    return db_path
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    return _create_db(tmp_path, LEGACY_SCHEMA)
+
+
+def test_processor_migrates_legacy_text_dates(legacy_db):
+    processor = AnalyticsDataProcessor(legacy_db)
+
+    leaderboard = processor.get_leaderboard_data(10)
+    assert leaderboard.loc[1, 'total_points'] == 70.0
+    assert leaderboard.loc[1, 'last_activity_date'] == pd.Timestamp('2025-08-14')
+
+    progress = processor.get_user_progress_data(1)
+    assert list(progress['daily_progress']['activity_date']) == [
+        pd.Timestamp('2025-08-13'), pd.Timestamp('2025-08-14')
+    ]
+
+
+def test_processor_backfills_missing_daily_progress(tmp_path):
+    # Epoch-day dates already, but from before the daily_progress table existed
+    db_path = _create_db(tmp_path, (
+        LEGACY_SCHEMA.replace("date_recorded DATE", "date_recorded INTEGER")
+        .replace("'2025-08-13'", "20313").replace("'2025-08-14'", "20314")
+    ))
+
+    progress = AnalyticsDataProcessor(db_path).get_user_progress_data(1)
+
+    assert list(progress['daily_progress']['daily_points']) == [50.0, 20.0]
+
+
+
+def test_leaderboards_are_cached_per_database(tmp_path):
+    boards = []
+    for name, km in (("first", 5.0), ("second", 2.0)):
+        (tmp_path / name).mkdir()
+        db = DatabaseManager(str(tmp_path / name / "fitness_challenge.db"))
+        user_id = db.create_user(name, "secret", name.title(), f"{name}@example.com")
+        db.add_performance(user_id, 1, km, date(2025, 8, 13))
+        boards.append(AnalyticsDataProcessor(db.db_path).get_leaderboard_data(10))
+
+    assert [list(board['username']) for board in boards] == [["first"], ["second"]]
+
+def test_duckdb_aggregations_match_sqlite(tmp_path):
+    pytest.importorskip('duckdb')
+    db = DatabaseManager(str(tmp_path / "fitness_challenge.db"))
+    user_id = db.create_user("runner", "secret", "Runner", "runner@example.com")
+    db.add_performance(user_id, 1, 5.0, date(2025, 8, 13))
+    db.add_performance(user_id, 1, 2.0, date(2025, 8, 14))
+
+    processor = get_processor(db.db_path)
+    assert processor._duck is not None, "DuckDB failed to attach the database"
+
+    duck_board = processor.get_sport_leaderboard("Running", 10)
+    processor._duck = None
+    cached_sport_leaderboard.clear()
+    sqlite_board = processor.get_sport_leaderboard("Running", 10)
+
+    pd.testing.assert_frame_equal(duck_board, sqlite_board)
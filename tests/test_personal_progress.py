@@ -0,0 +1,130 @@
+import os
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+
+from analytics.data_processing import get_processor
+from analytics.personal_progress import _cached_progress, _db_version, _load_or_fetch, _streak_lengths
+from database.db_manager import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "fitness_challenge.db"))
+
+
+def _view_progress(db_path, user_id):
+    """Load progress data the way the Personal Progress page does"""
+    return _cached_progress(db_path, user_id, _db_version(db_path))
+
+
+def test_streak_counts_run_ending_today():
+    active = np.array([1, 0, 1, 1, 1], dtype=np.int8)
+
+    assert _streak_lengths(active) == (3, 3, 4)
+
+
+def test_streak_survives_today_without_activity():
+    # Active every day through yesterday, nothing logged yet today
+    active = np.array([0, 1, 1, 1, 1, 0], dtype=np.int8)
+
+    assert _streak_lengths(active) == (4, 4, 4)
+
+
+def test_streak_broken_by_a_missed_day():
+    active = np.array([1, 1, 1, 0, 0], dtype=np.int8)
+
+    assert _streak_lengths(active) == (0, 3, 3)
+
+
+def test_progress_sees_activity_recorded_after_leaderboard_view(db):
+    user_id = db.create_user("runner", "secret", "Runner", "runner@example.com")
+    db.add_performance(user_id, 1, 5.0, date.today())  # Running, 10 points per km
+
+    # Viewing the leaderboard caches every user's totals
+    get_processor(db.db_path).get_leaderboard_data(50)
+    db.add_performance(user_id, 1, 10.0, date.today())
+
+    progress = _view_progress(db.db_path, user_id)
+    stats = progress['user_stats'].iloc[0]
+    assert (stats['total_activities'], stats['total_points']) == (2, 150.0)
+    assert progress['daily_progress']['daily_points'].sum() == 150.0
+
+    # With the in-memory caches gone the Parquet snapshot serves the same totals
+    st.cache_data.clear()
+    stats = _view_progress(db.db_path, user_id)['user_stats'].iloc[0]
+    assert (stats['total_activities'], stats['total_points']) == (2, 150.0)
+
+    # A later write invalidates the snapshot
+    db.add_performance(user_id, 1, 1.0, date.today())
+    stats = _view_progress(db.db_path, user_id)['user_stats'].iloc[0]
+    assert (stats['total_activities'], stats['total_points']) == (3, 160.0)
+
+
+def test_progress_average_is_zero_without_activities(db):
+    user_id = db.create_user("newcomer", "secret", "Newcomer", "newcomer@example.com")
+
+    stats = _view_progress(db.db_path, user_id)['user_stats'].iloc[0]
+
+    assert stats['total_activities'] == 0
+    assert stats['avg_points_per_activity'] == 0.0
+
+
+
+def test_concurrent_sessions_write_the_snapshot_safely(db, monkeypatch):
+    user_id = db.create_user("runner", "secret", "Runner", "runner@example.com")
+    db.add_performance(user_id, 1, 5.0, date.today())
+    version = _db_version(db.db_path)
+
+    # Hold both writers after their first temp file so their writes overlap
+    barrier = threading.Barrier(2, timeout=5)
+    to_parquet = pd.DataFrame.to_parquet
+
+    def to_parquet_in_step(frame, path, *args, **kwargs):
+        to_parquet(frame, path, *args, **kwargs)
+        if 'total_activities' in frame.columns:
+            barrier.wait()
+
+    replace = os.replace
+    failed_renames = []
+
+    def recording_replace(src, dst):
+        try:
+            replace(src, dst)
+        except OSError as exc:
+            failed_renames.append(exc)
+            raise
+
+    monkeypatch.setattr(pd.DataFrame, 'to_parquet', to_parquet_in_step)
+    monkeypatch.setattr(os, 'replace', recording_replace)
+    writers = [threading.Thread(target=_load_or_fetch, args=(db.db_path, user_id, version)) for _ in range(2)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert failed_renames == []
+    cache_dir = os.path.join(os.path.dirname(db.db_path), 'cache')
+    assert all(name.endswith('.parquet') for name in os.listdir(cache_dir))
+    stats = pd.read_parquet(os.path.join(cache_dir, f"user_{user_id}_user_stats.parquet"))
+    assert (stats.attrs['db_version'], stats['total_points'].iloc[0]) == (version, 50.0)
+
+@pytest.mark.parametrize("active", [
+    [1],
+    [0],
+    [1, 0, 1, 1, 1],
+    [0, 1, 1, 1, 1, 0],
+    [1, 1, 1, 0, 0],
+    [1, 1, 0, 1, 1, 1, 0, 1],
+])
+def test_numba_streaks_match_numpy(active):
+    pytest.importorskip('numba')
+    from analytics._streak_numba import streaks
+
+    active = np.array(active, dtype=np.int8)
+
+    assert tuple(streaks(active)) == _streak_lengths(active)
@@ -0,0 +1,71 @@
+import threading
+import time
+from contextlib import contextmanager
+
+class SQLiteConnectionPool:
+    """Bounded pool of SQLite connections; WAL mode lets pooled readers run alongside the writer"""
+
+    def __init__(self, connect, min_size=2, max_size=10, idle_timeout=300):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._size = 0
+
+        for _ in range(min_size):
+            self._idle.append((connect(), time.monotonic()))
+            self._size += 1
+
+    def _take(self):
+        """Take an idle connection, open a new one, or wait for one to be released"""
+        with self._cond:
+            while True:
+                self._close_expired()
+                if self._idle:
+                    return self._idle.pop()[0]
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                self._cond.wait()
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _close_expired(self):
+        """Close connections idle for longer than idle_timeout, keeping at least min_size open"""
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.pop(0)
+            conn.close()
+            self._size -= 1
+
+    def _release(self, conn):
+        """Return a connection to the pool, discarding any transaction it left open"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a connection for the duration of the block"""
+        conn = self._take()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self):
+        """Close every idle connection"""
+        with self._cond:
+            while self._idle:
+                self._idle.pop()[0].close()
+                self._size -= 1
@@ -0,0 +1,7 @@
+import streamlit as st
+from database.db_manager import DatabaseManager
+
+@st.cache_resource
+def get_db(db_path):
+    """Get the process-wide DatabaseManager for a database, shared by every session and rerun"""
+    return DatabaseManager(db_path)
@@ -1,19 +1,17 @@
+import sqlite3
 import streamlit as st
-from database.db_manager import DatabaseManager
+from utils.db_singleton import get_db
 
 class SessionManager:
-    def __init__(self):
-        self.db = DatabaseManager()
-        
-        # Initialize session state variables
-        if 'logged_in' not in st.session_state:
-            st.session_state.logged_in = False
-        if 'user_id' not in st.session_state:
-            st.session_state.user_id = None
-        if 'username' not in st.session_state:
-            st.session_state.username = None
-        if 'user_data' not in st.session_state:
-            st.session_state.user_data = None
+    def __init__(self, db_path):
+        self.db = get_db(db_path)
+    
+    def init_session_state(self):
+        """Initialize this session's state variables (the manager itself is shared across sessions)"""
+        st.session_state.setdefault('logged_in', False)
+        st.session_state.setdefault('user_id', None)
+        st.session_state.setdefault('username', None)
+        st.session_state.setdefault('user_data', None)
     
     def login(self, username, password):
         """Attempt to log in user"""
@@ -65,6 +63,7 @@ class SessionManager:
         try:
             user_id = self.db.create_user(username, password, full_name, email, gender, age_group, location)
             return user_id
-        except Exception as e:
+        except sqlite3.IntegrityError:
+            # Lost a race with another registration for the same username/email
             return None
 